@@ -3,8 +3,14 @@ AWSL 微信机器人配置 - 使用 Pydantic Settings
 支持从环境变量读取配置
 """
 
+import logging
+from typing import Final, Optional
+
+from pydantic import model_validator
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
+logger = logging.getLogger(__name__)
+
 
 class Config(BaseSettings):
     """配置类 - 自动从环境变量读取"""
@@ -24,8 +30,11 @@ class Config(BaseSettings):
     # 命令 API 地址
     COMMAND_API_BASE_URL: str = "https://your-api-domain.com/api"
 
-    # 检查消息间隔（秒）
-    CHECK_INTERVAL: int = 3
+    # 检查消息间隔（秒）：有新消息时按最小间隔轮询，空闲时逐步退避到最大间隔
+    MIN_CHECK_INTERVAL: float = 1.0
+    MAX_CHECK_INTERVAL: float = 15.0
+    # 已废弃：旧版固定检查间隔，仍设置时作为最小和最大间隔（即不退避）
+    CHECK_INTERVAL: Optional[float] = None
 
     # 触发冷却时间（秒）
     TRIGGER_COOLDOWN: int = 10
@@ -67,13 +76,41 @@ class Config(BaseSettings):
     HTTP_API_PORT: int = 8000
     HTTP_API_TOKEN: str = ""  # Bearer Token 认证，为空则不启用认证
 
+    @model_validator(mode="before")
+    @classmethod
+    def _apply_legacy_check_interval(cls, data):
+        """兼容旧配置 CHECK_INTERVAL：未单独设置的最小/最大间隔使用它的值"""
+        if not isinstance(data, dict):
+            return data
+        keys = {key.upper(): key for key in data}
+        legacy_key = keys.get("CHECK_INTERVAL")
+        if legacy_key is None or data[legacy_key] in (None, ""):
+            return data
+        logger.warning("CHECK_INTERVAL 已废弃，请改用 MIN_CHECK_INTERVAL 和 MAX_CHECK_INTERVAL")
+        data = dict(data)
+        for name in ("MIN_CHECK_INTERVAL", "MAX_CHECK_INTERVAL"):
+            if name not in keys:
+                data[name] = data[legacy_key]
+        return data
+
     model_config = SettingsConfigDict(
         env_file=".env",
         env_file_encoding="utf-8",
         case_sensitive=False,
-        extra="ignore"
+        extra="ignore",
+        frozen=True
     )
 
 
-# 创建全局配置实例
+# 创建全局配置实例（只读）
 config = Config()
+
+# 轮询热路径上读取的配置，导出为模块级常量，避免每次都经过 Pydantic 模型取值
+TRIGGER_KEYWORD: Final[str] = config.TRIGGER_KEYWORD
+MIN_CHECK_INTERVAL: Final[float] = config.MIN_CHECK_INTERVAL
+MAX_CHECK_INTERVAL: Final[float] = config.MAX_CHECK_INTERVAL
+TRIGGER_COOLDOWN: Final[int] = config.TRIGGER_COOLDOWN
+DEBUG: Final[bool] = config.DEBUG
+APPLESCRIPT_TIMEOUT_SHORT: Final[int] = config.APPLESCRIPT_TIMEOUT_SHORT
+APPLESCRIPT_TIMEOUT_MEDIUM: Final[int] = config.APPLESCRIPT_TIMEOUT_MEDIUM
+APPLESCRIPT_TIMEOUT_LONG: Final[int] = config.APPLESCRIPT_TIMEOUT_LONG
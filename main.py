@@ -9,22 +9,25 @@ import sys
 import time
 import datetime
 import logging
-import subprocess
 import tempfile
 import re
-import sqlite3
 import requests
 import queue
+import heapq
+import hashlib
+import functools
 import threading
+from collections import deque, OrderedDict, defaultdict
+from concurrent.futures import ThreadPoolExecutor
 
-from config import config
+from config import config, MIN_CHECK_INTERVAL, MAX_CHECK_INTERVAL, TRIGGER_COOLDOWN, TRIGGER_KEYWORD, DEBUG
 from src.adapters import get_wechat_adapter
 from src.services.ai import AIService
 from src.services.command import CommandService
 from src.services.http import HTTPServer
 
 # 根据配置设置日志级别
-log_level = logging.DEBUG if config.DEBUG else logging.INFO
+log_level = logging.DEBUG if DEBUG else logging.INFO
 
 # 日志配置
 logging.basicConfig(
@@ -33,36 +36,131 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+try:
+    import xxhash
+    HAS_XXHASH = True
+except ImportError:
+    HAS_XXHASH = False
+
+# 哈希上下文各段之间的分隔符（ASCII 单元分隔符）
+_CTX_SEP = b"\x1f"
+# 空闲时轮询间隔的退避倍数与最大退避次数
+_POLL_BACKOFF = 1.5
+_POLL_BACKOFF_MAX_STEPS = 7
+# 消息哈希包含的前文条数，以及每轮检测的最新消息条数
+_HASH_CONTEXT = 2
+_CHECK_LAST = 3
+# 定时命令提前多少秒发起请求，到点时回复已就绪
+_SCHEDULE_PREFETCH_LEAD = 5.0
+# 窗口存在性检查结果的复用时长（秒），期间不再调用 Exists
+_WINDOW_ALIVE_TTL = 5.0
+
+
+@functools.lru_cache(maxsize=64)
+def _hash_prefix(text: str) -> bytes:
+    """固定前缀段（如群名）的编码结果，每个群只编码一次"""
+    return text.encode('utf-8') + _CTX_SEP
+
+
+def _hash_parts(parts, prefix: bytes = b"") -> int:
+    """计算多段文本的 64 位稳定哈希（跨进程一致，优先使用 xxhash）
+
+    各段之间用 0x1f 分隔，避免消息内容本身含分隔符时出现碰撞。
+    先拼接成一段字节再一次性哈希，结果与逐段 update 相同，但只调用一次 C 函数。
+    prefix 为已编码的前缀段（见 _hash_prefix）。
+    """
+    data = prefix + _CTX_SEP.join([part.encode('utf-8') for part in parts]) + _CTX_SEP
+    if HAS_XXHASH:
+        return xxhash.xxh3_64_intdigest(data)
+    return int.from_bytes(hashlib.blake2b(data, digest_size=8).digest(), 'big')
+
+
+class TaskQueue:
+    """轻量任务队列：deque + Event，接口与 queue.Queue 的 put_nowait/get 保持一致
+
+    多个生产者（检测线程、调度线程、HTTP API）、单个消费者（处理线程）。
+    deque 的 append/popleft 本身是原子的，只用 Event 唤醒消费者。
+    """
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._items = deque()
+        self._event = threading.Event()
+
+    def put_nowait(self, item):
+        """加入任务
+
+        Raises:
+            queue.Full: 队列已满（并发写入时为近似上限）
+        """
+        if len(self._items) >= self.maxsize:
+            raise queue.Full
+        self._items.append(item)
+        self._event.set()
+
+    def get(self, timeout: float):
+        """取出任务，超时抛出 queue.Empty（仅供单个消费者调用）"""
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                return self._items.popleft()
+            except IndexError:
+                pass
+            self._event.clear()
+            # clear 之后再检查一次，避免错过刚加入的任务
+            if self._items:
+                continue
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or not self._event.wait(remaining):
+                raise queue.Empty
+
+    def qsize(self) -> int:
+        """当前待处理任务数"""
+        return len(self._items)
+
 
 class AWSlBot:
     """AWSL 机器人 - 支持多群监听"""
 
     def __init__(self):
         self.wechat = get_wechat_adapter()
-        self.max_cache = 200
+        self.max_cache = 2000  # 每个群保留的已处理消息哈希条数（每条只是一个整数，开销很小）
 
         # 群组配置（将在启动时初始化）
-        self.groups = []  # [{"name": "群名", "window": WindowControl对象, "thread": Thread对象}]
+        self.groups = []  # [{"name": "群名", "window": WindowControl对象}]
+        self.groups_by_name = {}  # {群名: groups 中对应的字典}，按名字查找群用
 
         # 消息队列（最多30个待处理消息，因为有多个群）
-        self.message_queue = queue.Queue(maxsize=30)
+        self.message_queue = TaskQueue(maxsize=30)
+
+        # 群级别的冷却控制（只在处理线程中读写）
+        self._next_ok_at = {}  # {group_name: 冷却结束的 monotonic 时间}
+
+        # 最近一次确认群窗口存在的时间（检测线程每轮刷新，发送失败时清除）
+        self._alive_at = {}  # {group_name: monotonic 时间}
+
+        # 已处理消息哈希（每个群一个 LRU 集合，最多 max_cache 条）
+        # 启动时检测线程会把当前可见消息全部标记为已处理，因此无需持久化
+        # 只由检测线程读写（单一写者），不需要加锁
+        self.hash_cache: dict[str, OrderedDict[int, None]] = defaultdict(OrderedDict)
+
+        # 触发词前缀 + 分隔空白 + 其余内容，一次匹配完成大小写无关的前缀判断和切分
+        self._trigger_re = re.compile(rf'{re.escape(TRIGGER_KEYWORD)}(\s*)(.*)', re.IGNORECASE | re.DOTALL)
 
-        # 群级别的冷却控制
-        self.last_trigger_time = {}  # {group_name: timestamp}
-        self.cooldown_lock = threading.Lock()
+        # 重复出现的消息直接复用触发分类结果
+        self._classify_trigger_cached = functools.lru_cache(maxsize=512)(self._classify_trigger)
 
-        # 数据库锁（保护数据库操作）
-        self.db_lock = threading.Lock()
+        # 网络请求线程池：命令/AI 请求在入队时即发起，与冷却等待、其他群的发送重叠
+        self._io_pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix="awsl-io")
 
         # 运行控制
         self.running = False
-        self.detector_threads = []  # 每个群一个检测线程
+        self._stop_event = threading.Event()  # 停止时唤醒等待中的线程
+        self.detector_thread = None  # 所有群共用一个检测线程
         self.processor_thread = None
         self.scheduler_thread = None
         self.http_thread = None  # HTTP API 服务线程
 
-        self._init_db()
-
         # 初始化 AI 服务
         try:
             self.ai_service = AIService()
@@ -83,83 +181,37 @@ class AWSlBot:
 
         logger.info("AWSL Bot 初始化完成")
 
-    def _init_db(self):
-        """初始化 SQLite 数据库（支持群级别去重）"""
-        db_path = os.path.join(os.path.dirname(__file__), 'messages.db')
-        self.conn = sqlite3.connect(db_path, check_same_thread=False)
-
-        # 检查是否需要迁移旧表结构
-        cursor = self.conn.execute(
-            "SELECT name FROM sqlite_master WHERE type='table' AND name='message_hashes'"
-        )
-        if cursor.fetchone():
-            # 检查是否已经有 group_name 字段
-            cursor = self.conn.execute("PRAGMA table_info(message_hashes)")
-            columns = [row[1] for row in cursor.fetchall()]
-            if 'group_name' not in columns:
-                logger.info("检测到旧数据库结构，正在迁移...")
-                # 删除旧表，重新创建
-                self.conn.execute("DROP TABLE message_hashes")
-                self.conn.commit()
-
-        # 创建新表结构（包含 group_name）
-        self.conn.execute('''
-            CREATE TABLE IF NOT EXISTS message_hashes (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                group_name TEXT NOT NULL,
-                hash TEXT NOT NULL,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                UNIQUE(group_name, hash)
-            )
-        ''')
-        self.conn.commit()
-        logger.debug("数据库初始化完成")
-
-    def _hash_message_with_context(self, messages: list, index: int, group_name: str) -> str:
+    def _hash_message_with_context(self, messages: list, index: int, group_name: str) -> int:
         """结合前向上下文和群名计算消息的唯一哈希值"""
-        current = messages[index]
-        context_size = 2
-        context_parts = []
-        for i in range(max(0, index - context_size), index):
-            context_parts.append(messages[i])
-        context_parts.append(current)
-        context = "|".join(context_parts)
         # 包含群名，避免不同群的相同消息被误判为重复
-        return str(hash(f"{group_name}:{context}"))
-
-    def _is_processed(self, msg_hash: str, group_name: str) -> bool:
-        """检查消息是否已处理（群级别）"""
-        with self.db_lock:
-            cursor = self.conn.execute(
-                'SELECT 1 FROM message_hashes WHERE hash = ? AND group_name = ?',
-                (msg_hash, group_name)
-            )
-            return cursor.fetchone() is not None
-
-    def _mark_processed(self, msg_hash: str, group_name: str):
-        """标记消息为已处理（群级别）"""
-        with self.db_lock:
-            try:
-                self.conn.execute(
-                    'INSERT OR IGNORE INTO message_hashes (hash, group_name) VALUES (?, ?)',
-                    (msg_hash, group_name)
-                )
-                self.conn.commit()
-            except sqlite3.Error as e:
-                logger.error(f"数据库写入失败: {e}")
-
-    def _cleanup_old_hashes(self):
-        """清理旧记录"""
-        with self.db_lock:
-            cursor = self.conn.execute('SELECT COUNT(*) FROM message_hashes')
-            count = cursor.fetchone()[0]
-            if count > self.max_cache:
-                self.conn.execute('''
-                    DELETE FROM message_hashes WHERE id IN (
-                        SELECT id FROM message_hashes ORDER BY id ASC LIMIT ?
-                    )
-                ''', (count - self.max_cache // 2,))
-                self.conn.commit()
+        return _hash_parts(messages[max(0, index - _HASH_CONTEXT):index + 1], _hash_prefix(group_name))
+
+    def _take_new_hashes(self, pairs: list[tuple], group_name: str) -> list[tuple]:
+        """从 (hash, 数据) 列表中筛出该群未处理的项并立即标记为已处理（仅在检测线程中调用）"""
+        new_pairs = []
+        seen = self.hash_cache[group_name]
+        taken = set()
+        for pair in pairs:
+            h = pair[0]
+            if h not in seen and h not in taken:
+                taken.add(h)
+                new_pairs.append(pair)
+        self._remember_hashes(seen, [pair[0] for pair in pairs])
+        return new_pairs
+
+    def _mark_processed(self, hashes: list[int], group_name: str):
+        """批量标记消息为已处理（群级别，仅在检测线程中调用），超出 max_cache 时淘汰最久未用的哈希"""
+        if not hashes:
+            return
+        self._remember_hashes(self.hash_cache[group_name], hashes)
+
+    def _remember_hashes(self, seen: OrderedDict, hashes):
+        """将哈希记为最近使用，超出 max_cache 时淘汰最久未用的哈希"""
+        for h in hashes:
+            seen[h] = None
+            seen.move_to_end(h)
+        while len(seen) > self.max_cache:
+            seen.popitem(last=False)
 
     def fetch_awsl_image(self) -> str:
         """从 API 获取随机图片 URL"""
@@ -188,16 +240,23 @@ class AWSlBot:
             return None
 
     def is_trigger(self, text: str) -> tuple:
-        """检查是否包含触发词"""
-        if "animated stickers" in text.lower():
-            return (None, "")
+        """检查是否包含触发词（命令列表版本作为缓存键的一部分，刷新后自动失效）"""
+        version = self.command_service.version if self.command_service else 0
+        return self._classify_trigger_cached(text, version)
+
+    def _classify_trigger(self, text: str, commands_version: int) -> tuple:
+        """对消息做触发分类（纯函数，结果可缓存；commands_version 只作为缓存键）
+
+        触发词优先于同名命令；命令匹配统一交给 CommandService（其索引在加载命令时构建）。
+        """
         content = text.strip()
-        content_lower = content.lower()
-        keyword_lower = config.TRIGGER_KEYWORD.lower()
-        if content_lower == f"{keyword_lower} hp":
-            return ("command_refresh", ("hp", ""))
-        if content_lower.startswith(keyword_lower):
-            after_keyword = content[len(config.TRIGGER_KEYWORD):].strip()
+        # 贴纸消息已由适配器过滤；正则直接跳过触发词后的空白，不需要 lower 整条消息
+        m = self._trigger_re.match(content)
+        if m:
+            sep, after_keyword = m.groups()
+            # 只有 "触发词 + 单个空格 + hp" 是刷新命令
+            if sep == " " and len(after_keyword) == 2 and after_keyword.lower() == "hp":
+                return ("command_refresh", ("hp", ""))
             if after_keyword:
                 return ("ai", after_keyword)
             return (None, "")
@@ -207,81 +266,178 @@ class AWSlBot:
                 return ("command", cmd_match)
         return (None, "")
 
-    def can_trigger(self, group_name: str) -> bool:
-        """检查指定群是否在冷却期"""
-        last_time = self.last_trigger_time.get(group_name, 0)
-        return time.time() - last_time >= config.TRIGGER_COOLDOWN
+    def _fetch_reply(self, trigger_type: str, content) -> str:
+        """执行触发对应的网络请求（命令 API / AI），返回待发送的文本"""
+        if trigger_type == "command" and self.command_service:
+            return self.command_service.execute_command(content[0], content[1])
+        if trigger_type == "ai" and self.ai_service:
+            return self.ai_service.ask(content)
+        if trigger_type == "command_refresh" and self.command_service:
+            return "已经成功了" if self.command_service.load_commands(refresh=True) else None
+        return None
+
+    def _get_reply(self, task: dict) -> str:
+        """获取任务的回复文本（优先使用入队时已发起的请求）"""
+        future = task.get('future')
+        if future is not None:
+            return future.result()
+        return self._fetch_reply(task['type'], task['content'])
+
+    def _enqueue_task(self, task: dict):
+        """将任务加入队列
+
+        命令/AI/刷新任务先在后台发起网络请求（已预取的任务直接复用），回复就绪后才进入队列，
+        处理线程不会因等待慢请求（如 AI）而耽误其他群的任务。
+
+        Raises:
+            queue.Full: 队列已满
+        """
+        if task['type'] not in ("command", "ai", "command_refresh"):
+            self.message_queue.put_nowait(task)
+            return
+        if self.message_queue.qsize() >= self.message_queue.maxsize:
+            if 'future' in task:
+                task['future'].cancel()
+            raise queue.Full
+        if 'future' not in task:
+            task['future'] = self._io_pool.submit(self._fetch_reply, task['type'], task['content'])
+        task['future'].add_done_callback(lambda future, task=task: self._on_reply_ready(task, future))
+
+    def _on_reply_ready(self, task: dict, future):
+        """后台请求完成后把任务放入队列（在线程池线程中调用）"""
+        if future.cancelled():
+            return
+        try:
+            self.message_queue.put_nowait(task)
+        except queue.Full:
+            logger.warning(f"[{task['group_name']}] 队列已满，丢弃回复")
+
+    def is_window_alive(self, group_name: str, window) -> bool:
+        """检查群窗口是否仍然存在，_WINDOW_ALIVE_TTL 秒内确认过的直接返回 True"""
+        now = time.monotonic()
+        last = self._alive_at.get(group_name)
+        if last is not None and now - last < _WINDOW_ALIVE_TTL:
+            return True
+        if window.Exists(0):
+            self._alive_at[group_name] = now
+            return True
+        self._alive_at.pop(group_name, None)
+        return False
+
+    def _send_text(self, group_name: str, window, text: str):
+        """发送文本，失败时清除窗口存在性缓存，下次重新检查"""
+        if not self.wechat.send_text_to_window(window, text):
+            self._alive_at.pop(group_name, None)
+
+    def _send_image(self, group_name: str, window, image_base64: str):
+        """发送图片，失败时清除窗口存在性缓存，下次重新检查"""
+        if not self.wechat.send_image_to_window(window, image_base64):
+            self._alive_at.pop(group_name, None)
 
     def mark_triggered(self, group_name: str):
-        """标记指定群已触发"""
-        self.last_trigger_time[group_name] = time.time()
+        """标记指定群已触发（使用单调时钟，不受系统时间调整影响）"""
+        self._next_ok_at[group_name] = time.monotonic() + TRIGGER_COOLDOWN
+
+    @staticmethod
+    def _next_fire_time(task: dict, now: float):
+        """计算定时任务在 now 之后的下一次触发时间戳，配置无效时返回 None"""
+        task_type = task.get('type')
+        if task_type == 'interval':
+            return now + task.get('seconds', 3600)
+        if task_type == 'daily':
+            try:
+                hour, minute = map(int, task.get('time', '').split(':'))
+                now_dt = datetime.datetime.fromtimestamp(now)
+                fire_dt = now_dt.replace(hour=hour, minute=minute, second=0, microsecond=0)
+            except ValueError:
+                return None
+            if fire_dt <= now_dt:
+                fire_dt += datetime.timedelta(days=1)
+            return fire_dt.timestamp()
+        return None
+
+    def _prefetch_command(self, task: dict) -> dict:
+        """为定时命令提前向每个群发起请求，返回 {群名: future}"""
+        content = (task['command'], task.get('params', ''))
+        return {
+            group['name']: self._io_pool.submit(self._fetch_reply, 'command', content)
+            for group in self.groups
+        }
 
     def scheduler_loop(self):
-        """定时任务调度循环（广播到所有群）"""
+        """定时任务调度循环（广播到所有群）
+
+        按下一次触发时间维护最小堆，只在最近的任务到期时醒来。
+        定时命令在到点前 _SCHEDULE_PREFETCH_LEAD 秒发起请求，到点时直接发送。
+        """
         logger.info("定时任务调度线程启动")
         tasks = config.SCHEDULED_TASKS
-        if not tasks:
-            while self.running:
-                time.sleep(60)
-            return
-        task_states = {}
+        now = time.time()
+        heap = []
         for i, task in enumerate(tasks):
-            if task.get('type') == 'interval':
-                task_states[i] = time.time()
-            else:
-                task_states[i] = ""
-        while self.running:
+            if not task.get('content') and not task.get('command'):
+                continue
+            fire_at = self._next_fire_time(task, now)
+            if fire_at is None:
+                logger.warning(f"定时任务[{i}] 配置无效，已忽略: {task}")
+                continue
+            heap.append((fire_at, i))
+        heapq.heapify(heap)
+        prefetched = {}  # {任务序号: {群名: future}}
+
+        while self.running and heap:
             try:
+                fire_at, i = heap[0]
+                wait = fire_at - time.time()
+                if wait > 0:
+                    if wait <= _SCHEDULE_PREFETCH_LEAD and tasks[i].get('command') and i not in prefetched:
+                        prefetched[i] = self._prefetch_command(tasks[i])
+                    elif wait > _SCHEDULE_PREFETCH_LEAD:
+                        wait -= _SCHEDULE_PREFETCH_LEAD
+                    # 最多等待 60 秒后重新检查，容忍系统时间调整
+                    self._stop_event.wait(min(wait, 60))
+                    continue
                 now = time.time()
-                current_dt = datetime.datetime.now()
-                current_time_str = current_dt.strftime("%H:%M")
-                current_date_str = current_dt.strftime("%Y-%m-%d")
-                for i, task in enumerate(tasks):
-                    task_type = task.get('type')
-                    content = task.get('content')
-                    command_name = task.get('command')
-                    if not content and not command_name:
-                        continue
-                    should_trigger = False
-                    if task_type == 'interval':
-                        if now - task_states.get(i, 0) >= task.get('seconds', 3600):
-                            should_trigger = True
-                            task_states[i] = now
-                    elif task_type == 'daily':
-                        if current_time_str == task.get('time') and task_states.get(i, "") != current_date_str:
-                            should_trigger = True
-                            task_states[i] = current_date_str
-
-                    if should_trigger:
-                        self._broadcast_task(task, now, i)
-
-                time.sleep(1)
+                heapq.heapreplace(heap, (self._next_fire_time(tasks[i], now), i))
+                self._broadcast_task(tasks[i], now, i, prefetched.pop(i, None))
             except Exception as e:
                 logger.error(f"调度线程出错: {e}")
-                time.sleep(5)
+                self._stop_event.wait(5)
+
+        # 没有定时任务时等待退出
+        self._stop_event.wait()
 
-    def _broadcast_task(self, task, now, task_index):
-        """将定时任务广播到所有群"""
+    def _broadcast_task(self, task, now, task_index, futures=None):
+        """将定时任务广播到所有群
+
+        Args:
+            futures: 预取的 {群名: future}，定时命令直接复用已发起的请求
+        """
         content = task.get('content')
         command_name = task.get('command')
+        futures = futures or {}
 
         # 遍历所有活跃的群
         for group in self.groups:
             # 检查窗口是否仍然存在
-            if not group["window"].Exists(0.5):
+            if not self.is_window_alive(group["name"], group["window"]):
                 logger.debug(f"群 [{group['name']}] 窗口已关闭，跳过定时任务")
                 continue
 
             try:
                 if command_name:
                     logger.info(f"⏰ 触发定时命令[{task_index}] 到 [{group['name']}]: {command_name}")
-                    self.message_queue.put_nowait({
+                    cmd_task = {
                         'type': 'command',
                         'group_name': group['name'],
                         'window': group['window'],
                         'content': (command_name, task.get('params', '')),
                         'timestamp': now
-                    })
+                    }
+                    future = futures.pop(group['name'], None)
+                    if future is not None:
+                        cmd_task['future'] = future
+                    self._enqueue_task(cmd_task)
                 else:
                     logger.info(f"⏰ 触发定时消息[{task_index}] 到 [{group['name']}]: {content}")
                     self.message_queue.put_nowait({
@@ -294,150 +450,222 @@ class AWSlBot:
             except queue.Full:
                 logger.warning(f"⚠ 队列已满，跳过群 [{group['name']}] 的任务")
 
-    def message_detector_loop(self, group_name: str, window):
-        """单个群的消息检测循环"""
-        logger.info(f"[{group_name}] 消息检测线程启动")
+        # 窗口已关闭的群用不上预取结果
+        for future in futures.values():
+            future.cancel()
+
+    def _detect_group(self, group_name: str, window, messages: list, state: dict) -> bool:
+        """检查单个群本轮读取到的消息，触发的消息加入队列
+
+        Args:
+            state: 该群的检测状态，跨轮次保留
+                - tail: 上一轮参与哈希的末尾消息
+                - hashes: 上一轮 {上下文: 哈希}，新消息到来时旧消息的哈希直接复用
+
+        Returns:
+            bool: 是否有新消息
+        """
+        # DEBUG: 打印完整消息列表
+        if DEBUG:
+            logger.debug(f"[{group_name}] 消息列表({len(messages)}条): {[m[:20]+'...' if len(m)>20 else m for m in messages]}")
+
+        # 哈希只取决于最后几条消息，末尾没变说明没有新消息，直接跳过哈希计算
+        tail = tuple(messages[-(_CHECK_LAST + _HASH_CONTEXT):])
+        if tail == state.get('tail'):
+            return False
+        state['tail'] = tail
+
+        # 算出最近几条消息的哈希（上一轮算过的上下文直接复用），再与已处理集合做差
+        prev_hashes = state.get('hashes', {})
+        hashes = {}
+        pairs = []
+        last_index = len(messages) - 1
+        for i in range(max(0, len(messages) - _CHECK_LAST), len(messages)):
+            ctx = tuple(messages[max(0, i - _HASH_CONTEXT):i + 1])
+            h = prev_hashes.get(ctx)
+            if h is None:
+                h = _hash_parts(ctx, _hash_prefix(group_name))
+            hashes[ctx] = h
+            pairs.append((h, i))
+        state['hashes'] = hashes
+        new_pairs = self._take_new_hashes(pairs, group_name)
+
+        if DEBUG:
+            seen_new = {h for h, _ in new_pairs}
+            for h, idx in pairs:
+                ctx = [messages[j][:15]+'...' if len(messages[j])>15 else messages[j] for j in range(max(0, idx-2), idx)]
+                logger.debug(f"[{group_name}] [{idx}] msg={messages[idx][:30]}... ctx={ctx} hash={h:016x} processed={h not in seen_new} is_last={idx == last_index} ctx_count={min(2, idx)}")
+
+        # 处理新消息
+        for h, idx in new_pairs:
+            msg = messages[idx]
+            # 只有最后一条消息（最新的）才触发
+            # 前面的消息即使未处理（哈希因滚动变化），也只标记不触发
+            if idx != last_index:
+                if DEBUG:
+                    logger.debug("[%s] 上下文不足，跳过触发: %.30s...", group_name, msg)
+                continue
+            trigger_type, content = self.is_trigger(msg)
+            if trigger_type:
+                logger.info("[%s] 检测到触发: %s", group_name, msg)
+                try:
+                    self._enqueue_task({
+                        'type': trigger_type,
+                        'group_name': group_name,
+                        'window': window,
+                        'content': content,
+                        'original_message': msg,
+                        'timestamp': time.time()
+                    })
+                except queue.Full:
+                    logger.warning(f"[{group_name}] 队列已满，跳过消息")
+        return bool(new_pairs)
+
+    def message_detector_loop(self):
+        """消息检测循环：单个线程轮流检查所有群
+
+        每轮一次性读取所有群的消息（适配器支持时并行读取），再逐个群去重、判断触发。
+        """
+        logger.info(f"消息检测线程启动，监听 {len(self.groups)} 个群")
+        # 去重只看最后 _CHECK_LAST 条消息及其上下文，适配器只需读取这么多
+        read_last = _CHECK_LAST + _HASH_CONTEXT
+        read_windows = self.wechat.get_messages_from_windows
+        active = list(self.groups)
 
         # 初始化：标记当前所有消息为已处理
         try:
-            initial_messages = self.wechat.get_messages_from_window(window)
-            for i, msg in enumerate(initial_messages):
+            for group, messages in zip(active, read_windows([g["window"] for g in active], read_last)):
                 self._mark_processed(
-                    self._hash_message_with_context(initial_messages, i, group_name),
-                    group_name
+                    [self._hash_message_with_context(messages, i, group["name"])
+                     for i in range(len(messages))],
+                    group["name"]
                 )
-            logger.debug(f"[{group_name}] 已标记 {len(initial_messages)} 条初始消息")
+                logger.debug("[%s] 已标记 %d 条初始消息", group["name"], len(messages))
         except Exception as e:
-            logger.error(f"[{group_name}] 初始化失败: {e}")
+            logger.error(f"初始化失败: {e}")
 
+        group_states = {}  # {群名: 检测状态}，见 _detect_group
+        idle_polls = 0
         while self.running:
             try:
-                # 检查窗口是否仍然存在
-                if not window.Exists(0.5):
-                    logger.warning(f"[{group_name}] 窗口已关闭，停止监听")
+                # 不阻塞地检查窗口是否仍然存在，已关闭的群移出轮询
+                alive = []
+                now = time.monotonic()
+                for group in active:
+                    if group["window"].Exists(0):
+                        alive.append(group)
+                        self._alive_at[group["name"]] = now
+                    else:
+                        self._alive_at.pop(group["name"], None)
+                        logger.warning(f"[{group['name']}] 窗口已关闭，停止监听")
+                active = alive
+                if not active:
+                    logger.warning("所有群的窗口都已关闭")
                     break
 
-                # 获取消息
-                messages = self.wechat.get_messages_from_window(window)
-
-                # DEBUG: 打印完整消息列表
-                if config.DEBUG:
-                    logger.debug(f"[{group_name}] 消息列表({len(messages)}条): {[m[:20]+'...' if len(m)>20 else m for m in messages]}")
-
-                messages_to_check = messages[-3:] if len(messages) > 3 else messages
-                start_index = len(messages) - len(messages_to_check)
-
-                # 检查新消息
-                new_messages = []
-                for i, msg in enumerate(messages_to_check):
-                    msg_hash = self._hash_message_with_context(messages, start_index + i, group_name)
-                    is_processed = self._is_processed(msg_hash, group_name)
-                    idx = start_index + i
-                    ctx_count = min(2, idx)  # 实际上下文数量
-                    is_last = (i == len(messages_to_check) - 1)  # 是否是最后一条
-                    if config.DEBUG:
-                        ctx = [messages[j][:15]+'...' if len(messages[j])>15 else messages[j] for j in range(max(0, idx-2), idx)]
-                        logger.debug(f"[{group_name}] [{i}] msg={msg[:30]}... ctx={ctx} hash={msg_hash[-8:]} processed={is_processed} is_last={is_last} ctx_count={ctx_count}")
-                    if not is_processed:
-                        # 只有最后一条消息（最新的）才触发
-                        # 前面的消息即使未处理（哈希因滚动变化），也只标记不触发
-                        if is_last:
-                            new_messages.append((msg, msg_hash, True))  # True = 可触发
-                        else:
-                            new_messages.append((msg, msg_hash, False))  # False = 只标记不触发
-
-                # 处理新消息
-                for msg, msg_hash, can_trigger in new_messages:
-                    self._mark_processed(msg_hash, group_name)
-                    if not can_trigger:
-                        if config.DEBUG:
-                            logger.debug(f"[{group_name}] 上下文不足，跳过触发: {msg[:30]}...")
+                has_new = False
+                for group, messages in zip(active, read_windows([g["window"] for g in active], read_last)):
+                    name = group["name"]
+                    try:
+                        group_new = self._detect_group(
+                            name, group["window"], messages, group_states.setdefault(name, {})
+                        )
+                    except Exception as e:
+                        logger.error(f"[{name}] 检测出错: {e}")
                         continue
-                    trigger_type, content = self.is_trigger(msg)
-                    if trigger_type:
-                        logger.info(f"[{group_name}] 检测到触发: {msg}")
-                        try:
-                            self.message_queue.put_nowait({
-                                'type': trigger_type,
-                                'group_name': group_name,
-                                'window': window,
-                                'content': content,
-                                'original_message': msg,
-                                'timestamp': time.time()
-                            })
-                        except queue.Full:
-                            logger.warning(f"[{group_name}] 队列已满，跳过消息")
-
-                self._cleanup_old_hashes()
-                time.sleep(config.CHECK_INTERVAL)
+                    has_new = has_new or group_new
+
+                # 有新消息时保持高频轮询，连续空闲则指数退避
+                if has_new:
+                    idle_polls = 0
+                    interval = MIN_CHECK_INTERVAL
+                else:
+                    idle_polls += 1
+                    interval = min(
+                        MAX_CHECK_INTERVAL,
+                        MIN_CHECK_INTERVAL * _POLL_BACKOFF ** min(idle_polls, _POLL_BACKOFF_MAX_STEPS)
+                    )
+                self._stop_event.wait(interval)
             except Exception as e:
-                logger.error(f"[{group_name}] 检测出错: {e}")
-                time.sleep(1)
+                logger.error(f"检测出错: {e}")
+                self._stop_event.wait(1)
 
-        logger.info(f"[{group_name}] 消息检测线程退出")
+        logger.info("消息检测线程退出")
 
     def message_processor_loop(self):
-        """消息处理循环（串行发送）"""
+        """消息处理循环（串行发送）
+
+        冷却中的群的任务暂存到按就绪时间排序的堆里，不阻塞其他群的任务。
+        """
         logger.info("消息处理线程启动")
+        deferred = []  # [(就绪时间, 序号, task)]
+        seq = 0
+        monotonic = time.monotonic
+        queue_get = self.message_queue.get
         while self.running:
             try:
-                task = self.message_queue.get(timeout=1)
+                # 优先处理冷却已结束的暂存任务，否则等待新任务（最多等到下一个暂存任务就绪）
+                if deferred and deferred[0][0] <= monotonic():
+                    task = heapq.heappop(deferred)[2]
+                else:
+                    wait = min(1.0, deferred[0][0] - monotonic()) if deferred else 1.0
+                    try:
+                        task = queue_get(timeout=max(wait, 0.01))
+                    except queue.Empty:
+                        continue
+
                 trigger_type = task['type']
                 content = task['content']
                 group_name = task['group_name']
                 window = task['window']
+                is_direct = trigger_type in ("text", "image")
+
+                # 冷却控制（按群区分，文本/图片直发不受限）：未到时间则暂存，先处理其他群
+                # 在检查窗口之前判断，暂存的任务不必每次都调用 Exists
+                if not is_direct:
+                    ready_at = self._next_ok_at.get(group_name, 0.0)
+                    if ready_at > monotonic():
+                        logger.debug("[%s] 冷却中，%.1f 秒后处理", group_name, ready_at - monotonic())
+                        seq += 1
+                        heapq.heappush(deferred, (ready_at, seq, task))
+                        continue
 
-                # 检查窗口是否仍然存在
-                if not window.Exists(0.5):
+                # 检查窗口是否仍然存在（检测线程最近确认过的直接复用）
+                if not self.is_window_alive(group_name, window):
                     logger.warning(f"[{group_name}] 目标窗口已关闭，跳过消息")
-                    self.message_queue.task_done()
                     continue
 
                 # 处理文本消息（定时任务或 HTTP API）
                 if trigger_type == "text":
-                    with self.cooldown_lock:
-                        self.wechat.send_text_to_window(window, content)
-                        self.mark_triggered(group_name)
-                    self.message_queue.task_done()
+                    self._send_text(group_name, window, content)
+                    self.mark_triggered(group_name)
                     continue
 
                 # 处理图片消息（HTTP API 或定时任务）
                 if trigger_type == "image":
-                    with self.cooldown_lock:
-                        self.wechat.send_image_to_window(window, content)
-                        self.mark_triggered(group_name)
-                    self.message_queue.task_done()
-                    continue
-
-                # 冷却控制（按群区分）
-                with self.cooldown_lock:
-                    if not self.can_trigger(group_name):
-                        remaining = config.TRIGGER_COOLDOWN - (time.time() - self.last_trigger_time.get(group_name, 0))
-                        logger.debug(f"[{group_name}] 冷却中，等待 {remaining:.1f} 秒")
-                        time.sleep(remaining)
-
-                    # 处理命令
-                    if trigger_type == "command" and self.command_service:
-                        logger.info(f"[{group_name}] 执行命令: {content[0]}")
-                        res = self.command_service.execute_command(content[0], content[1])
-                        if res:
-                            self.wechat.send_text_to_window(window, res)
-                    # 刷新命令列表
-                    elif trigger_type == "command_refresh":
-                        logger.info(f"[{group_name}] 刷新命令列表")
-                        if self.command_service.load_commands():
-                            self.wechat.send_text_to_window(window, "已经成功了")
-                    # AI 回复
-                    elif trigger_type == "ai" and self.ai_service:
-                        logger.info(f"[{group_name}] AI回复: {content}")
-                        ans = self.ai_service.ask(content)
-                        self.wechat.send_text_to_window(window, ans if ans else "抱歉，我现在无法回答这个问题 😅")
-
+                    self._send_image(group_name, window, content)
                     self.mark_triggered(group_name)
+                    continue
 
-                self.message_queue.task_done()
-            except queue.Empty:
-                continue
+                # 处理命令
+                if trigger_type == "command" and self.command_service:
+                    logger.info("[%s] 执行命令: %s", group_name, content[0])
+                    res = self._get_reply(task)
+                    if res:
+                        self._send_text(group_name, window, res)
+                # 刷新命令列表
+                elif trigger_type == "command_refresh":
+                    logger.info("[%s] 刷新命令列表", group_name)
+                    res = self._get_reply(task)
+                    if res:
+                        self._send_text(group_name, window, res)
+                # AI 回复
+                elif trigger_type == "ai" and self.ai_service:
+                    logger.info("[%s] AI回复: %s", group_name, content)
+                    ans = self._get_reply(task)
+                    self._send_text(group_name, window, ans if ans else "抱歉，我现在无法回答这个问题 😅")
+
+                self.mark_triggered(group_name)
             except Exception as e:
                 logger.error(f"处理出错: {e}", exc_info=True)
 
@@ -474,27 +702,21 @@ class AWSlBot:
         for w in selected_windows:
             self.groups.append({
                 "name": w["title"],
-                "window": w["window"],
-                "thread": None
+                "window": w["window"]
             })
             print(f"  - {w['title']}")
             # 初始化冷却时间
-            self.last_trigger_time[w["title"]] = 0
+            self._next_ok_at[w["title"]] = 0.0
+        self.groups_by_name = {g["name"]: g for g in self.groups}
 
         # 启动所有线程
         print("\n正在启动监听...")
         self.running = True
 
-        # 为每个群创建检测线程
-        for group in self.groups:
-            thread = threading.Thread(
-                target=self.message_detector_loop,
-                args=(group["name"], group["window"]),
-                daemon=True
-            )
-            thread.start()
-            group["thread"] = thread
-            logger.info(f"已启动检测线程: {group['name']}")
+        # 启动检测线程（轮流检查所有群）
+        self.detector_thread = threading.Thread(target=self.message_detector_loop, daemon=True)
+        self.detector_thread.start()
+        logger.info("已启动检测线程")
 
         # 启动处理线程
         self.processor_thread = threading.Thread(target=self.message_processor_loop, daemon=True)
@@ -530,14 +752,15 @@ class AWSlBot:
         try:
             while True:
                 time.sleep(1)
-                # 检查是否所有检测线程都已退出
-                alive_threads = [g for g in self.groups if g["thread"].is_alive()]
-                if not alive_threads:
-                    logger.warning("所有检测线程已退出")
+                # 检查检测线程是否已退出（所有群的窗口都已关闭）
+                if not self.detector_thread.is_alive():
+                    logger.warning("检测线程已退出")
                     break
         except KeyboardInterrupt:
             logger.info("收到停止信号")
             self.running = False
+        finally:
+            self._stop_event.set()
 
 
 def main():
@@ -38,3 +38,17 @@ class BaseWeChatAdapter(ABC):
                 - window: 窗口控制对象
         """
         pass
+
+    def get_messages_from_windows(self, windows: list, last_n: int | None = None) -> list[list[str]]:
+        """读取多个窗口的消息（默认逐个读取，适配器可覆盖为并行读取）
+
+        Args:
+            windows: 窗口对象列表
+            last_n: 只需要每个窗口最后 n 条消息时传入，适配器可据此只读取末尾
+
+        Returns:
+            list[list[str]]: 与 windows 顺序一致的消息列表
+        """
+        if last_n:
+            return [self.get_messages_from_window(w)[-last_n:] for w in windows]
+        return [self.get_messages_from_window(w) for w in windows]
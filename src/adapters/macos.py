@@ -1,15 +1,52 @@
 import time
 import subprocess
-import re
-import os
 import logging
 import Quartz
+from AppKit import NSWorkspace, NSPasteboard, NSPasteboardTypeString, NSImage
+from Foundation import NSData
 from src.adapters.base import BaseWeChatAdapter
-from config import config
-from src.utils.accessibility import get_messages_via_accessibility
+from config import config, APPLESCRIPT_TIMEOUT_SHORT, APPLESCRIPT_TIMEOUT_LONG
+from src.utils.accessibility import (
+    HAS_AX,
+    get_messages_via_accessibility,
+    get_messages_from_element,
+    get_focused_element,
+    get_focused_value,
+    is_text_input_focused,
+    resolve_messages_list,
+)
 
 logger = logging.getLogger(__name__)
 
+# 纯时间戳消息（如 "12:30"）：删除数字和冒号后为空
+_TIMESTAMP_CHARS = str.maketrans('', '', '0123456789:')
+
+# 需要过滤的界面元素文本
+_NOISE = frozenset({'<', '>', 'S', '...', 'Image'})
+
+# 贴纸消息的标记文本（不区分大小写），在源头过滤掉，不参与去重和触发
+_STICKER_MARK = 'animated stickers'
+
+# 前台应用检查结果的缓存时长（秒）
+_FRONTMOST_CACHE_TTL = 0.5
+
+# AppleScript 读取的窗口位置缓存时长（秒）
+_BOUNDS_CACHE_TTL = 10.0
+
+# 读取微信窗口位置的 AppleScript（Quartz 窗口列表不可用时的回退），进程名通过 argv 传入
+_WINDOW_BOUNDS_SCRIPT = '''
+on run argv
+    tell application "System Events"
+        tell process (item 1 of argv)
+            set wechatWindow to window 1
+            set {wx, wy} to position of wechatWindow
+            set {ww, wh} to size of wechatWindow
+            return (wx as text) & "," & (wy as text) & "," & (ww as text) & "," & (wh as text)
+        end tell
+    end tell
+end run
+'''
+
 
 class MacOSWindow:
     """macOS 单群模式的虚拟窗口对象"""
@@ -23,6 +60,77 @@ class MacOSWindow:
         return True
 
 
+# 虚拟键码
+_KEY_F = 3
+_KEY_V = 9
+_KEY_RETURN = 36
+_KEY_ESCAPE = 53
+
+# 切换聊天时各步骤的最长等待时间（秒）：搜索框获得焦点、搜索框出现粘贴的内容、进入聊天（焦点离开搜索框）
+_SEARCH_FOCUS_TIMEOUT = 1.0
+_SEARCH_INPUT_TIMEOUT = 1.0
+_OPEN_CHAT_TIMEOUT = 1.0
+# 搜索框内容就绪后留给微信刷新搜索结果的时间（秒）
+_SEARCH_SETTLE = 0.3
+# 切换聊天时轮询焦点元素的间隔（秒），每次只读取一两个 AX 属性
+_FIND_CHAT_POLL = 0.05
+
+# 粘贴后等待输入框出现内容、回车后等待输入框清空的最长时间（秒），图片比文本慢
+_PASTE_GAP_TEXT = 0.1
+_PASTE_GAP_IMAGE = 0.3
+_SEND_SETTLE_TEXT = 0.2
+_SEND_SETTLE_IMAGE = 0.5
+# 粘贴后至少等待的时间（秒），给微信处理按键留出余量
+_PASTE_MIN_GAP = 0.05
+
+
+def _set_clipboard_text(text: str):
+    """直接通过 NSPasteboard 写入文本剪贴板"""
+    pb = NSPasteboard.generalPasteboard()
+    pb.clearContents()
+    pb.setString_forType_(text, NSPasteboardTypeString)
+
+
+def _set_clipboard_image(image_path: str) -> bool:
+    """通过 NSImage 读取图片并写入剪贴板（支持系统能解码的所有格式）"""
+    return _write_clipboard_image(NSImage.alloc().initWithContentsOfFile_(image_path))
+
+
+def _set_clipboard_image_data(image_data: bytes) -> bool:
+    """直接从内存中的图片字节写入剪贴板，不经过临时文件"""
+    data = NSData.dataWithBytes_length_(image_data, len(image_data))
+    return _write_clipboard_image(NSImage.alloc().initWithData_(data))
+
+
+def _write_clipboard_image(img) -> bool:
+    """将 NSImage 写入剪贴板，图片无法解码（img 为 None）时返回 False"""
+    if img is None:
+        return False
+    pb = NSPasteboard.generalPasteboard()
+    pb.clearContents()
+    return bool(pb.writeObjects_([img]))
+
+
+def _post_keys(pid: int, keys: list):
+    """按顺序向指定进程发送按键，keys 为 [(虚拟键码, 修饰键 flags), ...]"""
+    for keycode, flags in keys:
+        for key_down in (True, False):
+            event = Quartz.CGEventCreateKeyboardEvent(None, keycode, key_down)
+            Quartz.CGEventSetFlags(event, flags)
+            Quartz.CGEventPostToPid(pid, event)
+
+
+def _wait_until(pred, timeout: float = 1.0, interval: float = 0.01) -> bool:
+    """轮询等待条件成立，超时返回 False"""
+    deadline = time.monotonic() + timeout
+    while True:
+        if pred():
+            return True
+        if time.monotonic() >= deadline:
+            return False
+        time.sleep(interval)
+
+
 class MacOSWeChatAdapter(BaseWeChatAdapter):
     def __init__(self):
         self.process_name = self._detect_wechat_process()
@@ -30,33 +138,67 @@ class MacOSWeChatAdapter(BaseWeChatAdapter):
             raise RuntimeError("微信未运行，请先启动微信")
         logger.info(f"检测到微信进程: {self.process_name}")
 
+        # 当前聊天的消息列表 AX 元素，切换聊天或失效时重新查找
+        self._messages_axref = None
+        self._messages_cache = {}
+        # 上次过滤的 (原始消息列表, 过滤结果)，原始列表未变（同一对象）时直接复用
+        self._filtered_cache = (None, [])
+
+        # 前台检查缓存 (时间, 微信是否在前台)
+        self._frontmost_cache = (0.0, False)
+
+        # AppleScript 回退路径读到的窗口位置 (时间, "x,y,w,h")
+        self._bounds_cache = (0.0, None)
+
     def _detect_wechat_process(self) -> str:
-        """检测微信进程名称"""
-        result = subprocess.run(['pgrep', 'WeChat'], capture_output=True)
-        if result.returncode == 0:
-            return "WeChat"
-        result = subprocess.run(['pgrep', '微信'], capture_output=True)
-        if result.returncode == 0:
-            return "微信"
+        """检测微信进程名称（同时记录进程 PID）"""
+        self.process_pid = None
+        for app in NSWorkspace.sharedWorkspace().runningApplications():
+            name = app.localizedName()
+            if name in ("WeChat", "微信"):
+                self.process_pid = app.processIdentifier()
+                return name
         return None
 
-    def _run_applescript(self, script: str) -> str:
-        """执行 AppleScript"""
+    @staticmethod
+    def _frontmost_pid() -> int:
+        """当前前台应用的 PID"""
+        app = NSWorkspace.sharedWorkspace().frontmostApplication()
+        return app.processIdentifier() if app else None
+
+    def _run_applescript(self, script: str, args: list = (), timeout: int = None) -> str:
+        """执行 AppleScript，参数通过 argv 传入（避免字符串拼接注入）"""
+        timeout = timeout or APPLESCRIPT_TIMEOUT_LONG
         result = subprocess.run(
-            ['osascript', '-e', script],
+            ['osascript', '-e', script, *args],
             capture_output=True,
             text=True,
-            timeout=config.APPLESCRIPT_TIMEOUT_LONG
+            timeout=timeout
         )
         if result.returncode != 0:
             logger.debug(f"AppleScript 错误: {result.stderr}")
             return None
         return result.stdout.strip()
 
+    def _wechat_is_frontmost(self) -> bool:
+        """微信是否在前台（结果短时缓存）"""
+        now = time.monotonic()
+        checked_at, is_front = self._frontmost_cache
+        if now - checked_at > _FRONTMOST_CACHE_TTL:
+            is_front = self._frontmost_pid() == self.process_pid
+            self._frontmost_cache = (now, is_front)
+        return is_front
+
     def activate_window(self):
-        """激活微信窗口"""
+        """激活微信窗口（已在前台时跳过）"""
+        if self._wechat_is_frontmost():
+            return
         subprocess.run(['open', '-a', self.process_name], check=True)
-        time.sleep(0.3)
+        # 等到微信真正成为前台应用，而不是固定等待
+        is_front = _wait_until(lambda: self._frontmost_pid() == self.process_pid, timeout=1.0)
+        if not is_front:
+            logger.debug("等待微信切换到前台超时")
+        self._frontmost_cache = (time.monotonic(), is_front)
 
     def find_all_wechat_windows(self) -> list[dict]:
         """查找所有微信窗口（macOS 单群模式）
@@ -96,57 +238,69 @@ class MacOSWeChatAdapter(BaseWeChatAdapter):
             bool: 是否发送成功
         """
         import base64
-        import tempfile
-        import os
 
         try:
-            # 解码 base64 数据
-            image_data = base64.b64decode(image_base64)
-
-            # 创建临时文件
-            with tempfile.NamedTemporaryFile(suffix='.png', delete=False) as tmp_file:
-                tmp_file.write(image_data)
-                tmp_path = tmp_file.name
-
-            # 使用现有的 send_image 方法发送
-            success = self.send_image(tmp_path)
-
-            # 删除临时文件
-            try:
-                os.unlink(tmp_path)
-            except:
-                pass
-
-            return success
+            # 解码后直接写入剪贴板，不落地临时文件
+            if not _set_clipboard_image_data(base64.b64decode(image_base64)):
+                logger.error("复制图片失败")
+                return False
+            self.activate_window()
+            self._paste_and_return(_PASTE_GAP_IMAGE, _SEND_SETTLE_IMAGE)
+            return True
         except Exception as e:
             logger.error(f"发送图片失败: {e}")
             return False
 
+    def _window_bounds(self):
+        """通过 Quartz 窗口列表读取微信主窗口位置 (x, y, w, h)，找不到返回 None"""
+        windows = Quartz.CGWindowListCopyWindowInfo(
+            Quartz.kCGWindowListOptionOnScreenOnly, Quartz.kCGNullWindowID
+        )
+        best = None
+        for info in windows or ():
+            if info.get(Quartz.kCGWindowOwnerPID) != self.process_pid:
+                continue
+            # 只看普通窗口层，排除菜单栏图标、浮层等
+            if info.get(Quartz.kCGWindowLayer, 0) != 0:
+                continue
+            b = info.get(Quartz.kCGWindowBounds)
+            if not b:
+                continue
+            bounds = (float(b['X']), float(b['Y']), float(b['Width']), float(b['Height']))
+            if best is None or bounds[2] * bounds[3] > best[2] * best[3]:
+                best = bounds
+        return best
+
     def click_input_box(self):
         """点击输入框以获得焦点"""
-        script = f'''
-        tell application "System Events"
-            tell process "{self.process_name}"
-                set wechatWindow to window 1
-                set {{wx, wy}} to position of wechatWindow
-                set {{ww, wh}} to size of wechatWindow
-                return (wx as text) & "," & (wy as text) & "," & (ww as text) & "," & (wh as text)
-            end tell
-        end tell
-        '''
-        try:
-            result = subprocess.run(['osascript', '-e', script],
-                                  capture_output=True, text=True, timeout=config.APPLESCRIPT_TIMEOUT_SHORT)
-        except subprocess.TimeoutExpired:
-            logger.warning(f"获取窗口位置超时（{config.APPLESCRIPT_TIMEOUT_SHORT}秒）")
-            return False
-
-        if result.returncode != 0:
-            logger.warning(f"获取窗口位置失败: {result.stderr}")
-            return False
+        bounds = self._window_bounds()
+        if bounds:
+            return self._click_input_box_at(bounds)
 
+        # 窗口列表里找不到时（如屏幕录制权限受限）回退到 AppleScript，结果短时复用
+        cached_at, output = self._bounds_cache
+        if output is None or time.monotonic() - cached_at > _BOUNDS_CACHE_TTL:
+            try:
+                output = self._run_applescript(
+                    _WINDOW_BOUNDS_SCRIPT, [self.process_name], timeout=APPLESCRIPT_TIMEOUT_SHORT
+                )
+            except subprocess.TimeoutExpired:
+                logger.warning(f"获取窗口位置超时（{APPLESCRIPT_TIMEOUT_SHORT}秒）")
+                return False
+
+            if output is None:
+                logger.warning("获取窗口位置失败")
+                return False
+            self._bounds_cache = (time.monotonic(), output)
+
+        return self._click_input_box_at(output)
+
+    def _click_input_box_at(self, bounds) -> bool:
+        """根据窗口位置点击输入框，bounds 为 (x, y, w, h) 或 "x,y,w,h" 字符串"""
         try:
-            wx, wy, ww, wh = map(float, result.stdout.strip().split(','))
+            if isinstance(bounds, str):
+                bounds = bounds.split(',')
+            wx, wy, ww, wh = map(float, bounds)
         except Exception as e:
             logger.warning(f"解析窗口坐标失败: {e}")
             return False
@@ -154,46 +308,54 @@ class MacOSWeChatAdapter(BaseWeChatAdapter):
         click_x = wx + ww * 0.6
         click_y = wy + wh * 0.92
 
-        move_event = Quartz.CGEventCreateMouseEvent(
-            None, Quartz.kCGEventMouseMoved, (click_x, click_y), 0
-        )
-        Quartz.CGEventPost(Quartz.kCGHIDEventTap, move_event)
-        time.sleep(0.05)
-
-        mouse_down = Quartz.CGEventCreateMouseEvent(
-            None, Quartz.kCGEventLeftMouseDown, (click_x, click_y), 0
-        )
-        Quartz.CGEventPost(Quartz.kCGHIDEventTap, mouse_down)
-        time.sleep(0.05)
-
-        mouse_up = Quartz.CGEventCreateMouseEvent(
-            None, Quartz.kCGEventLeftMouseUp, (click_x, click_y), 0
-        )
-        Quartz.CGEventPost(Quartz.kCGHIDEventTap, mouse_up)
+        # 事件按顺序投递，直接发给微信进程，无需在事件间等待
+        for event_type in (Quartz.kCGEventMouseMoved, Quartz.kCGEventLeftMouseDown, Quartz.kCGEventLeftMouseUp):
+            event = Quartz.CGEventCreateMouseEvent(None, event_type, (click_x, click_y), 0)
+            if self.process_pid:
+                Quartz.CGEventPostToPid(self.process_pid, event)
+            else:
+                Quartz.CGEventPost(Quartz.kCGHIDEventTap, event)
         return True
 
     def find_chat(self, chat_name: str) -> bool:
-        """查找并切换到指定聊天窗口"""
+        """查找并切换到指定聊天窗口
+
+        能读取 AX 时按焦点元素的状态等待：搜索框获得焦点后粘贴，搜索框内容变为聊天名后
+        稍等搜索结果刷新再回车，焦点离开搜索框后退出搜索；否则按固定延时等待。
+        """
         self.activate_window()
-        time.sleep(0.2)
-
-        script = f'''
-        set the clipboard to "{chat_name}"
-        tell application "System Events"
-            tell process "{self.process_name}"
-                keystroke "f" using command down
-                delay 0.3
-                keystroke "v" using command down
-                delay 1.0
-                key code 36
-                delay 0.5
-                key code 53
-                delay 0.3
-            end tell
-        end tell
-        '''
-        self._run_applescript(script)
-        time.sleep(0.5)
+        self._messages_axref = None
+        pid = self.process_pid
+        _set_clipboard_text(chat_name)
+
+        # 聊天输入框本身也是输入框，要等焦点换到另一个输入框（搜索框）上
+        previous_focus = get_focused_element(pid) if HAS_AX else None
+        _post_keys(pid, [(_KEY_F, Quartz.kCGEventFlagMaskCommand)])
+        search_field = None
+        if HAS_AX:
+            _wait_until(lambda: get_focused_element(pid) != previous_focus and is_text_input_focused(pid),
+                        timeout=_SEARCH_FOCUS_TIMEOUT, interval=_FIND_CHAT_POLL)
+            search_field = get_focused_element(pid)
+        else:
+            time.sleep(0.3)
+
+        _post_keys(pid, [(_KEY_V, Quartz.kCGEventFlagMaskCommand)])
+        if HAS_AX:
+            if not _wait_until(lambda: get_focused_value(pid) == chat_name,
+                               timeout=_SEARCH_INPUT_TIMEOUT, interval=_FIND_CHAT_POLL):
+                logger.warning(f"等待搜索框输入超时: {chat_name}")
+            time.sleep(_SEARCH_SETTLE)
+        else:
+            time.sleep(1.0)
+
+        _post_keys(pid, [(_KEY_RETURN, 0)])
+        if search_field is not None:
+            _wait_until(lambda: get_focused_element(pid) != search_field,
+                        timeout=_OPEN_CHAT_TIMEOUT, interval=_FIND_CHAT_POLL)
+        else:
+            time.sleep(0.5)
+
+        _post_keys(pid, [(_KEY_ESCAPE, 0)])
         self.click_input_box()
         logger.info(f"已切换到聊天: {chat_name}")
         return True
@@ -201,69 +363,65 @@ class MacOSWeChatAdapter(BaseWeChatAdapter):
     def get_messages(self) -> list:
         """获取当前聊天窗口的消息"""
         self.activate_window()
-        time.sleep(0.2)
-        all_messages = get_messages_via_accessibility(self.process_name)
-        messages = []
-        for text in all_messages:
-            if len(text) < 2:
-                continue
-            if re.match(r'^[\d:]+$', text):
-                continue
-            if text in ['<', '>', 'S', '...', 'Image', 'Animated Stickers']:
-                continue
-            messages.append(text)
-        return messages
+        all_messages = None
+        if HAS_AX:
+            if self._messages_axref is None:
+                self._messages_axref = resolve_messages_list(self.process_pid)
+                self._messages_cache = {}
+            if self._messages_axref is not None:
+                all_messages = get_messages_from_element(self._messages_axref, self._messages_cache)
+                if all_messages is None:
+                    # 元素已失效（窗口关闭或重建），下次重新查找
+                    self._messages_axref = None
+        if all_messages is None:
+            all_messages = get_messages_via_accessibility(self.process_name)
+
+        raw, filtered = self._filtered_cache
+        if all_messages is not raw:
+            # 先做 O(1) 的集合判断，再做时间戳判断
+            noise, ts_chars, sticker = _NOISE, _TIMESTAMP_CHARS, _STICKER_MARK
+            filtered = [
+                text for text in all_messages
+                if len(text) >= 2 and text not in noise and text.translate(ts_chars)
+                and sticker not in text.casefold()
+            ]
+            self._filtered_cache = (all_messages, filtered)
+        return list(filtered)
+
+    def _input_value(self):
+        """读取微信输入框（焦点元素）的内容，无法读取时返回 None"""
+        if not HAS_AX:
+            return None
+        try:
+            return get_focused_value(self.process_pid)
+        except Exception:
+            return None
+
+    def _paste_and_return(self, gap: float, settle: float):
+        """向微信发送 Cmd+V 和回车
+
+        粘贴后等输入框出现内容再回车（最多 gap 秒），回车后等输入框清空（最多 settle 秒）。
+        读不到输入框时按最长时间等待，与固定延时等价。
+        """
+        _post_keys(self.process_pid, [(_KEY_V, Quartz.kCGEventFlagMaskCommand)])
+        time.sleep(_PASTE_MIN_GAP)
+        _wait_until(lambda: bool(self._input_value()), timeout=gap - _PASTE_MIN_GAP)
+        _post_keys(self.process_pid, [(_KEY_RETURN, 0)])
+        _wait_until(lambda: self._input_value() == "", timeout=settle)
 
     def send_text(self, text: str) -> bool:
         """发送文本消息"""
         self.activate_window()
-        time.sleep(0.2)
-        script = f'''
-        set the clipboard to "{text}"
-        tell application "System Events"
-            tell process "{self.process_name}"
-                keystroke "v" using command down
-                delay 0.3
-                key code 36
-            end tell
-        end tell
-        '''
-        self._run_applescript(script)
-        time.sleep(0.5)
+        _set_clipboard_text(text)
+        self._paste_and_return(_PASTE_GAP_TEXT, _SEND_SETTLE_TEXT)
         return True
 
     def send_image(self, image_path: str) -> bool:
         """发送图片"""
-        script = f'''
-        set theFile to POSIX file "{image_path}"
-        try
-            set the clipboard to (read theFile as JPEG picture)
-        on error
-            set the clipboard to (read theFile as «class PNGf»)
-        end try
-        '''
-        try:
-            result = subprocess.run(['osascript', '-e', script], capture_output=True, text=True, timeout=config.APPLESCRIPT_TIMEOUT_SHORT)
-        except subprocess.TimeoutExpired:
-            logger.error(f"复制图片到剪贴板超时")
-            return False
-
-        if result.returncode != 0:
-            logger.error(f"复制图片失败: {result.stderr}")
+        if not _set_clipboard_image(image_path):
+            logger.error("复制图片失败")
             return False
 
-        time.sleep(0.3)
         self.activate_window()
-        time.sleep(0.2)
-        script = f'''
-        tell application "System Events"
-            tell process "{self.process_name}"
-                keystroke "v" using command down
-                delay 0.5
-                key code 36
-            end tell
-        end tell
-        '''
-        self._run_applescript(script)
-        time.sleep(1.0)
+        self._paste_and_return(_PASTE_GAP_IMAGE, _SEND_SETTLE_IMAGE)
         return True
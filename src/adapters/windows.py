@@ -1,15 +1,173 @@
 import time
+import ctypes
 import logging
-import re
+import struct
+import threading
+from ctypes import wintypes
+from concurrent.futures import Future, ThreadPoolExecutor
 import uiautomation as auto
 from src.adapters.base import BaseWeChatAdapter
-from config import config
 
 logger = logging.getLogger(__name__)
 
+# 纯时间戳消息（如 "12:30"）：删除数字和冒号后为空
+_TIMESTAMP_CHARS = str.maketrans('', '', '0123456789:')
+
+# 需要过滤的占位消息
+_NOISE = frozenset({'[图片]', '[表情]', '[视频]', '[文件]'})
+
+# 贴纸消息的标记文本（不区分大小写），在源头过滤掉，不参与去重和触发
+_STICKER_MARK = 'animated stickers'
+
+
+def _filter_messages(texts) -> list[str]:
+    """过滤噪音：先做 O(1) 的集合判断，再做时间戳判断"""
+    noise, ts_chars, sticker = _NOISE, _TIMESTAMP_CHARS, _STICKER_MARK
+    return [
+        text for text in texts
+        if text and len(text) >= 2 and text not in noise and text.translate(ts_chars)
+        and sticker not in text.casefold()
+    ]
+
+
+# ============================================================
+# SendInput 键盘事件
+# ============================================================
+
+INPUT_KEYBOARD = 1
+KEYEVENTF_KEYUP = 0x0002
+VK_CONTROL = 0x11
+VK_DELETE = 0x2E
+VK_RETURN = 0x0D
+VK_A = 0x41
+VK_V = 0x56
+
+
+class MOUSEINPUT(ctypes.Structure):
+    _fields_ = [
+        ("dx", wintypes.LONG),
+        ("dy", wintypes.LONG),
+        ("mouseData", wintypes.DWORD),
+        ("dwFlags", wintypes.DWORD),
+        ("time", wintypes.DWORD),
+        ("dwExtraInfo", ctypes.c_size_t),
+    ]
+
+
+class KEYBDINPUT(ctypes.Structure):
+    _fields_ = [
+        ("wVk", wintypes.WORD),
+        ("wScan", wintypes.WORD),
+        ("dwFlags", wintypes.DWORD),
+        ("time", wintypes.DWORD),
+        ("dwExtraInfo", ctypes.c_size_t),
+    ]
+
+
+class _INPUTUNION(ctypes.Union):
+    # 联合体需包含最大的 MOUSEINPUT，保证 sizeof(INPUT) 与系统一致
+    _fields_ = [("mi", MOUSEINPUT), ("ki", KEYBDINPUT)]
+
+
+class INPUT(ctypes.Structure):
+    _fields_ = [("type", wintypes.DWORD), ("u", _INPUTUNION)]
+
+
+def _key(vk: int, up: bool = False) -> INPUT:
+    """构造一个键盘按下/抬起事件"""
+    return INPUT(type=INPUT_KEYBOARD, u=_INPUTUNION(ki=KEYBDINPUT(
+        wVk=vk, wScan=0, dwFlags=KEYEVENTF_KEYUP if up else 0, time=0, dwExtraInfo=0
+    )))
+
+
+def _chord(modifier: int, vk: int) -> list:
+    """组合键，如 Ctrl+V"""
+    return [_key(modifier), _key(vk), _key(vk, up=True), _key(modifier, up=True)]
+
+
+def _tap(vk: int) -> list:
+    """单个按键"""
+    return [_key(vk), _key(vk, up=True)]
+
+
+# 清空草稿 -> 粘贴 -> 发送
+CLEAR_PASTE_ENTER = _chord(VK_CONTROL, VK_A) + _tap(VK_DELETE) + _chord(VK_CONTROL, VK_V) + _tap(VK_RETURN)
+
+
+# send_text 的步骤名称（用于错误日志）
+_STEP_ACTIVATE = "步骤 1: 窗口激活"
+_STEP_CLIPBOARD = "步骤 2: 设置剪贴板"
+_STEP_SEND = "步骤 3: 粘贴发送"
+
+# ============================================================
+# 剪贴板图片（CF_DIBV5）
+# ============================================================
+
+CF_DIBV5 = 17
+BI_BITFIELDS = 3
+LCS_SRGB = 0x73524742
+LCS_GM_IMAGES = 4
+# BITMAPV5HEADER（124 字节）
+_BITMAPV5HEADER = struct.Struct('<IiiHHIIiiIIIIIII36xIIIIIII')
+
+
+def _set_clipboard_image(img):
+    """将 PIL 图片以 32 位 CF_DIBV5 写入剪贴板
+
+    直接使用像素数据，无需先编码成 BMP 再去掉文件头。
+    """
+    import win32clipboard
+
+    if img.mode != "RGBA":
+        img = img.convert("RGBA")
+    width, height = img.size
+    # DIB 默认自下而上存储，按 BGRA 输出并翻转行序
+    pixels = img.tobytes("raw", "BGRA", 0, -1)
+    header = _BITMAPV5HEADER.pack(
+        _BITMAPV5HEADER.size, width, height, 1, 32, BI_BITFIELDS, len(pixels), 0, 0, 0, 0,
+        0x00FF0000, 0x0000FF00, 0x000000FF, 0xFF000000,
+        LCS_SRGB, 0, 0, 0, LCS_GM_IMAGES, 0, 0, 0
+    )
+
+    win32clipboard.OpenClipboard()
+    try:
+        win32clipboard.EmptyClipboard()
+        win32clipboard.SetClipboardData(CF_DIBV5, header + pixels)
+    finally:
+        win32clipboard.CloseClipboard()
+
+
+def _set_clipboard_text(text: str):
+    """以 CF_UNICODETEXT 写入剪贴板
+
+    直接使用 Windows API，避免 auto.SetClipboardText 截断长文本，
+    也省去写入后再读回校验的一次往返。
+    """
+    import win32clipboard
+    import win32con
+
+    win32clipboard.OpenClipboard()
+    try:
+        win32clipboard.EmptyClipboard()
+        win32clipboard.SetClipboardData(win32con.CF_UNICODETEXT, text)
+    finally:
+        win32clipboard.CloseClipboard()
+
+
 class WindowsWeChatAdapter(BaseWeChatAdapter):
     def __init__(self):
         self.window = None
+        # 读取线程的线程局部状态：每个读取线程只服务一个窗口，即每个窗口一份控件和消息缓存（见 _reader_for）
+        self._local = threading.local()
+        # 已尝试从最小化状态还原过的窗口
+        self._restored_windows: set[tuple] = set()
+        # find_all_wechat_windows 结果的短时缓存
+        self._windows_cache: list[dict] = []
+        self._windows_cache_time = 0.0
+        # 读取消息可在后台窗口并行进行（每个窗口一个读取线程 {窗口句柄: 单线程执行器}）；发送需要前台窗口，必须串行
+        self._readers: dict[int, ThreadPoolExecutor] = {}
+        self._readers_lock = threading.Lock()
+        self._send_lock = threading.Lock()
         self._bind_window()
 
     def _bind_window(self):
@@ -68,6 +226,10 @@ class WindowsWeChatAdapter(BaseWeChatAdapter):
                 - window: WindowControl 对象
                 - class: 窗口类名
         """
+        # 窗口集合几乎不变，1 秒内的重复调用直接复用上次结果
+        if self._windows_cache and time.monotonic() - self._windows_cache_time < 1.0:
+            return list(self._windows_cache)
+
         logger.info("正在扫描所有微信窗口...")
         all_windows = []
 
@@ -112,7 +274,10 @@ class WindowsWeChatAdapter(BaseWeChatAdapter):
         ]
 
         logger.info(f"找到 {len(popup_windows)} 个群聊窗口")
-        return popup_windows
+        self._prune_readers()
+        self._windows_cache = popup_windows
+        self._windows_cache_time = time.monotonic()
+        return list(popup_windows)
 
     def activate_specific_window(self, window):
         """激活指定的微信窗口
@@ -144,59 +309,219 @@ class WindowsWeChatAdapter(BaseWeChatAdapter):
         except Exception as e:
             logger.debug(f"激活窗口时出现警告: {e}")
 
-    def get_messages_from_window(self, window) -> list[str]:
-        """从指定窗口获取消息
+    @staticmethod
+    def _window_key(window) -> tuple:
+        """窗口的缓存键（优先使用 UIA RuntimeId）"""
+        try:
+            return tuple(window.GetRuntimeId())
+        except Exception:
+            return (id(window),)
+
+    def _reader_for(self, handle: int) -> ThreadPoolExecutor:
+        """获取窗口专属的读取线程，不存在时创建
+
+        每个窗口固定由一个线程读取：线程启动时初始化一次 COM，窗口和消息列表控件都在该线程中创建和使用，
+        缓存随线程保存（每个窗口一份），不同窗口之间并行读取
+        """
+        with self._readers_lock:
+            reader = self._readers.get(handle)
+            if reader is None:
+                reader = ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"uia-read-{handle}",
+                                            initializer=auto.InitializeUIAutomationInCurrentThread)
+                self._readers[handle] = reader
+            return reader
+
+    def _prune_readers(self):
+        """关闭已关闭窗口的读取线程"""
+        with self._readers_lock:
+            for handle in [h for h in self._readers if not ctypes.windll.user32.IsWindow(h)]:
+                self._readers.pop(handle).shutdown(wait=False)
+
+    def _read_in_reader(self, handle: int, last_n: int | None) -> list[str]:
+        """在窗口专属的读取线程中读取消息（窗口控件由本线程根据句柄创建）"""
+        state = self._local
+        if getattr(state, 'window', None) is None:
+            state.window = auto.ControlFromHandle(handle)
+            # 消息列表控件
+            state.msg_list = None
+            # 上次提取结果 (首项 Name, 每个子项的文本, 过滤后的消息, 起始下标)，轮询时只提取和过滤新增子项
+            # 只读取末尾时起始下标之前的子项未提取（文本为 None），起始下标为 0 表示完整
+            state.tail = None
+            if state.window is None:
+                logger.warning(f"无法通过句柄获取窗口控件: {handle}")
+                return []
+        return self._read_messages(state, last_n)
+
+    def _find_message_list(self, state):
+        """定位窗口中的消息列表控件（带缓存，仅在窗口的读取线程中调用）
 
         Args:
-            window: WindowControl 对象
+            state: 读取线程的线程局部状态
 
         Returns:
-            list[str]: 消息列表
+            ListControl 对象，未找到返回 None
         """
-        self.activate_specific_window(window)
+        msg_list = state.msg_list
+        if msg_list is not None:
+            if msg_list.Exists(0):
+                return msg_list
+            # 控件已失效，重新查找
+            state.msg_list = None
+            state.tail = None
 
         logger.debug("正在查找消息列表...")
         # 方案1：通过名称查找
-        msg_list = window.ListControl(Name="消息")
+        msg_list = state.window.ListControl(Name="消息")
         if not msg_list.Exists(0.5):
             logger.debug("未找到名为'消息'的列表，尝试查找任意 ListControl...")
             # 方案2：查找第一个 ListControl
-            msg_list = window.ListControl()
+            msg_list = state.window.ListControl()
 
         if not msg_list.Exists(0):
             logger.warning("在当前窗口中未找到任何消息列表控件。")
+            return None
+
+        state.msg_list = msg_list
+        return msg_list
+
+    def _read_messages(self, state, last_n: int | None) -> list[str]:
+        """读取窗口消息（仅在窗口的读取线程中调用）"""
+        # 只读操作，UIA 可直接读取后台窗口，无需激活
+        msg_list = self._find_message_list(state)
+        if msg_list is None and self._show_minimized_once(state.window):
+            msg_list = self._find_message_list(state)
+        if msg_list is None:
             return []
 
-        logger.debug("成功定位消息列表，正在提取消息...")
-        messages = []
         try:
-            # 遍历消息列表的子项
-            for item in msg_list.GetChildren():
-                # 新版微信的消息内容在子控件的 Name 属性里
-                if item.ControlTypeName == 'ListItemControl':
-                    text_control = item.TextControl()
-                    # 有些消息是图片或表情，没有文本控件
-                    if text_control.Exists(0):
-                         messages.append(text_control.Name)
-                    else: # 尝试直接获取 ListItemControl 的 Name
-                        messages.append(item.Name)
-
-            # 过滤噪音
-            filtered_messages = []
-            for text in messages:
-                if not text or len(text) < 2:
-                    continue
-                if text in ['[图片]', '[表情]', '[视频]', '[文件]', 'Animated Stickers']:
-                    continue
-                if re.match(r'^[\d:]+$', text):  # 纯时间戳
-                    continue
-                filtered_messages.append(text)
-
-            return filtered_messages
+            children = msg_list.GetChildren()
+            head = children[0].Name if children else None
+
+            # 列表只在尾部追加时，只提取新增的子项；否则（滚动、切换聊天、旧消息被回收）全量提取
+            cached = state.tail
+            if (cached and cached[0] == head and len(children) >= len(cached[1])
+                    and (cached[3] == 0 or (last_n and len(cached[2]) >= last_n))):
+                new_texts = [self._extract_item_text(item) for item in children[len(cached[1]):]]
+                texts = cached[1] + new_texts
+                messages = cached[2] + _filter_messages(new_texts) if new_texts else cached[2]
+                start = cached[3]
+            elif last_n:
+                start, texts, messages = self._extract_tail(children, last_n)
+            else:
+                logger.debug("成功定位消息列表，正在提取消息...")
+                texts = [self._extract_item_text(item) for item in children]
+                messages = _filter_messages(texts)
+                start = 0
+            state.tail = (head, texts, messages, start)
+            # 返回副本（切片同样是副本），调用方修改不影响缓存
+            return messages[-last_n:] if last_n else list(messages)
         except Exception as e:
+            # 缓存的控件可能已失效（COMError 等），下次重新查找
+            state.msg_list = None
+            state.tail = None
             logger.error(f"提取消息时出错: {e}")
             return []
 
+    def _submit_read(self, window, last_n: int | None) -> Future | None:
+        """将窗口的读取提交到其专属读取线程，窗口没有句柄时返回 None"""
+        handle = window.NativeWindowHandle
+        if not handle:
+            logger.warning(f"窗口没有句柄，无法读取消息: {window.Name}")
+            return None
+        return self._reader_for(handle).submit(self._read_in_reader, handle, last_n)
+
+    def get_messages_from_window(self, window, last_n: int | None = None) -> list[str]:
+        """从指定窗口获取消息
+
+        Args:
+            window: WindowControl 对象
+            last_n: 只需要最后 n 条消息时传入，需要重新提取时从末尾倒序提取，凑够 n 条即停止
+
+        Returns:
+            list[str]: 消息列表
+        """
+        future = self._submit_read(window, last_n)
+        return future.result() if future else []
+
+    def _extract_tail(self, children, n: int) -> tuple[int, list, list[str]]:
+        """从末尾倒序提取子项文本，过滤后凑够 n 条消息即停止
+
+        Returns:
+            tuple: (起始下标, 每个子项的文本（未提取的为 None）, 过滤后的消息)
+        """
+        tail = []
+        count = 0
+        start = len(children)
+        while start > 0 and count < n:
+            start -= 1
+            text = self._extract_item_text(children[start])
+            tail.append(text)
+            if _filter_messages((text,)):
+                count += 1
+        tail.reverse()
+        return start, [None] * start + tail, _filter_messages(tail)
+
+    def _show_minimized_once(self, window) -> bool:
+        """最小化窗口的 UIA 树可能不完整，每个窗口最多一次以不激活的方式恢复显示
+
+        Returns:
+            bool: 是否执行了恢复
+        """
+        key = self._window_key(window)
+        if key in self._restored_windows:
+            return False
+        handle = window.NativeWindowHandle
+        if not handle or not auto.IsIconic(handle):
+            return False
+        self._restored_windows.add(key)
+        # SW_SHOWNA 会保持最小化状态，这里用 SW_SHOWNOACTIVATE 还原窗口但不抢占焦点
+        auto.ShowWindow(handle, auto.SW.ShowNoActivate)
+        logger.info(f"窗口处于最小化状态，已在后台还原: {window.Name}")
+        return True
+
+    @staticmethod
+    def _extract_item_text(item):
+        """提取消息列表子项的文本，非消息项返回 None"""
+        # 新版微信的消息内容在子控件的 Name 属性里
+        if item.ControlTypeName != 'ListItemControl':
+            return None
+        text_control = item.TextControl()
+        # 有些消息是图片或表情，没有文本控件
+        if text_control.Exists(0):
+            return text_control.Name
+        # 尝试直接获取 ListItemControl 的 Name
+        return item.Name
+
+    def get_messages_from_windows(self, windows: list, last_n: int | None = None) -> list[list[str]]:
+        """并行读取多个窗口的消息
+
+        Args:
+            windows: WindowControl 对象列表
+            last_n: 只需要每个窗口最后 n 条消息时传入
+
+        Returns:
+            list[list[str]]: 与 windows 顺序一致的消息列表
+        """
+        futures = [self._submit_read(w, last_n) for w in windows]
+        return [future.result() if future else [] for future in futures]
+
+    def _send_input_sequence(self, window, events: list):
+        """通过一次 SendInput 调用提交整组键盘事件
+
+        Args:
+            window: 接收按键的 WindowControl 对象（需位于前台）
+            events: INPUT 事件列表
+        """
+        user32 = ctypes.windll.user32
+        hwnd = window.NativeWindowHandle
+        if hwnd and user32.GetForegroundWindow() != hwnd:
+            window.SetForeground()
+
+        arr = (INPUT * len(events))(*events)
+        sent = user32.SendInput(len(events), arr, ctypes.sizeof(INPUT))
+        if sent != len(events):
+            raise ctypes.WinError()
+
     def send_text_to_window(self, window, text: str) -> bool:
         """向指定窗口发送文本消息
 
@@ -207,42 +532,22 @@ class WindowsWeChatAdapter(BaseWeChatAdapter):
         Returns:
             bool: 是否发送成功
         """
-        logger.debug(f"[send_text_to_window] 向窗口 {window.Name} 发送: {text[:20]}...")
+        with self._send_lock:
+            return self._send_text_to_window(window, text)
+
+    def _send_text_to_window(self, window, text: str) -> bool:
+        """send_text_to_window 的实现（调用方需持有 _send_lock）"""
+        logger.debug("[send_text_to_window] 向窗口 %s 发送: %.20s...", window.Name, text)
 
         # 激活窗口
         self.activate_specific_window(window)
 
         try:
-            # 清空可能存在的草稿
-            window.SendKeys('{CTRL}a{DELETE}', waitTime=0.2)
-
             # 通过剪贴板设置文本
-            auto.SetClipboardText(text)
-
-            # 验证剪贴板内容
-            clipboard_content = auto.GetClipboardText()
-            if clipboard_content != text:
-                if config.DEBUG:
-                    logger.debug(f"剪贴板截断！原始长度={len(text)} 剪贴板长度={len(clipboard_content)}")
-                    logger.debug(f"原始内容: {repr(text)}")
-                    logger.debug(f"剪贴板内容: {repr(clipboard_content)}")
-
-                # 使用 Windows API 重新设置
-                import win32clipboard
-                import win32con
-                win32clipboard.OpenClipboard()
-                win32clipboard.EmptyClipboard()
-                win32clipboard.SetClipboardData(win32con.CF_UNICODETEXT, text)
-                win32clipboard.CloseClipboard()
-
-                if config.DEBUG:
-                    logger.debug("已使用 win32clipboard 重新设置剪贴板")
-
-            # 粘贴
-            window.SendKeys('{CTRL}v', waitTime=0.2)
-
-            # 发送消息
-            window.SendKeys('{ENTER}', waitTime=0.2)
+            _set_clipboard_text(text)
+
+            # 清空草稿、粘贴、发送（一次 SendInput 提交）
+            self._send_input_sequence(window, CLEAR_PASTE_ENTER)
 
             logger.info(f"✓ 发送成功到 [{window.Name}]: {text[:20]}...")
             return True
@@ -260,9 +565,13 @@ class WindowsWeChatAdapter(BaseWeChatAdapter):
         Returns:
             bool: 是否发送成功
         """
+        with self._send_lock:
+            return self._send_image_to_window(window, image_base64)
+
+    def _send_image_to_window(self, window, image_base64: str) -> bool:
+        """send_image_to_window 的实现（调用方需持有 _send_lock）"""
         import base64
         from PIL import Image
-        import win32clipboard
         import io
 
         logger.debug(f"[send_image_to_window] 向窗口 {window.Name} 发送图片...")
@@ -274,20 +583,9 @@ class WindowsWeChatAdapter(BaseWeChatAdapter):
             # 解码 base64 数据
             image_data = base64.b64decode(image_base64)
 
-            # 使用 PIL 读取图片
+            # 使用 PIL 读取图片并复制到剪贴板
             img = Image.open(io.BytesIO(image_data))
-
-            # 转换为 BMP 格式（Windows 剪贴板支持）
-            output = io.BytesIO()
-            img.convert("RGB").save(output, "BMP")
-            bmp_data = output.getvalue()[14:]  # 移除 BMP 文件头
-            output.close()
-
-            # 复制到剪贴板
-            win32clipboard.OpenClipboard()
-            win32clipboard.EmptyClipboard()
-            win32clipboard.SetClipboardData(win32clipboard.CF_DIB, bmp_data)
-            win32clipboard.CloseClipboard()
+            _set_clipboard_image(img)
 
             time.sleep(0.3)
 
@@ -325,151 +623,44 @@ class WindowsWeChatAdapter(BaseWeChatAdapter):
     def get_messages(self) -> list[str]:
         """获取当前聊天记录"""
         self.activate_window()
-        
-        logger.debug("正在查找消息列表...")
-        # 方案1：通过名称查找
-        msg_list = self.window.ListControl(Name="消息")
-        if not msg_list.Exists(0.5):
-            logger.debug("未找到名为'消息'的列表，尝试查找任意 ListControl...")
-            # 方案2：查找第一个 ListControl
-            msg_list = self.window.ListControl()
-
-        if not msg_list.Exists(0):
-            logger.warning("在当前窗口中未找到任何消息列表控件。")
-            return []
-
-        logger.debug("成功定位消息列表，正在提取消息...")
-        messages = []
-        try:
-            # 遍历消息列表的子项
-            for item in msg_list.GetChildren():
-                # 新版微信的消息内容在子控件的 Name 属性里
-                if item.ControlTypeName == 'ListItemControl':
-                    text_control = item.TextControl()
-                    # 有些消息是图片或表情，没有文本控件
-                    if text_control.Exists(0):
-                         messages.append(text_control.Name)
-                    else: # 尝试直接获取 ListItemControl 的 Name
-                        messages.append(item.Name)
-
-            # 过滤噪音
-            filtered_messages = []
-            for text in messages:
-                if not text or len(text) < 2:
-                    continue
-                if text in ['[图片]', '[表情]', '[视频]', '[文件]', 'Animated Stickers']:
-                    continue
-                if re.match(r'^[\d:]+$', text):  # 纯时间戳
-                    continue
-                filtered_messages.append(text)
-                
-            return filtered_messages
-        except Exception as e:
-            logger.error(f"提取消息时出错: {e}")
-            return []
+        return self.get_messages_from_window(self.window)
 
     def send_text(self, text: str) -> bool:
         """发送文本消息 (直接对当前焦点进行操作)"""
-        # 步骤 0: 记录方法入口信息
-        logger.debug(f"[send_text] 方法入口 - 文本内容: '{text}'")
-        logger.debug(f"[send_text] 文本类型: {type(text)}, 长度: {len(text)}")
+        logger.debug("[send_text] 文本长度: %d", len(text))
 
         # 步骤 1: 激活窗口
-        logger.debug("[send_text] 步骤 1: 开始激活窗口")
         try:
             self.activate_window()
-            logger.debug("[send_text] 步骤 1: 窗口激活成功")
         except Exception as e:
-            logger.error(f"[send_text] 步骤 1: 窗口激活失败 - {type(e).__name__}: {e}")
+            logger.error("[send_text] %s失败 - %s: %s", _STEP_ACTIVATE, type(e).__name__, e)
             return False
 
-        # 步骤 2: 清空可能存在的草稿
-        logger.debug("[send_text] 步骤 2: 准备清空草稿")
-        clear_keys = '{CTRL}a{DELETE}'
-        logger.debug(f"[send_text] 步骤 2: 按键序列 - '{clear_keys}' (类型: {type(clear_keys)}, 长度: {len(clear_keys)})")
+        # 步骤 2: 通过剪贴板设置文本
         try:
-            self.window.SendKeys(clear_keys, waitTime=0.2)
-            logger.debug("[send_text] 步骤 2: 清空草稿成功")
+            _set_clipboard_text(text)
         except Exception as e:
-            logger.error(f"[send_text] 步骤 2: 清空草稿失败 - {type(e).__name__}: {e}")
-            logger.error(f"[send_text] 步骤 2: 异常详情", exc_info=True)
+            logger.error("[send_text] %s失败 - %s: %s", _STEP_CLIPBOARD, type(e).__name__, e)
             return False
 
-        # 步骤 3: 通过剪贴板设置文本
-        logger.debug("[send_text] 步骤 3: 准备设置剪贴板")
-        logger.debug(f"[send_text] 步骤 3: 剪贴板文本 - '{text}' (类型: {type(text)})")
+        # 步骤 3: 清空草稿、粘贴、发送（一次 SendInput 提交）
         try:
-            auto.SetClipboardText(text)
-
-            # 验证剪贴板内容
-            clipboard_content = auto.GetClipboardText()
-            logger.debug(f"[send_text] 步骤 3: 验证剪贴板内容 - '{clipboard_content}'")
-
-            if clipboard_content != text:
-                logger.warning(f"[send_text] 剪贴板截断！原始长度={len(text)} 剪贴板长度={len(clipboard_content)}")
-
-                # 使用 Windows API 重新设置
-                import win32clipboard
-                import win32con
-                win32clipboard.OpenClipboard()
-                win32clipboard.EmptyClipboard()
-                win32clipboard.SetClipboardData(win32con.CF_UNICODETEXT, text)
-                win32clipboard.CloseClipboard()
-
-                logger.debug("[send_text] 步骤 3: 已使用 win32clipboard 重新设置")
-
-            logger.debug("[send_text] 步骤 3: 剪贴板设置成功")
-        except Exception as e:
-            logger.error(f"[send_text] 步骤 3: 设置剪贴板失败 - {type(e).__name__}: {e}")
-            logger.error(f"[send_text] 步骤 3: 异常详情", exc_info=True)
-            return False
-
-        # 步骤 4: 粘贴
-        logger.debug("[send_text] 步骤 4: 准备粘贴")
-        paste_keys = '{CTRL}v'
-        logger.debug(f"[send_text] 步骤 4: 按键序列 - '{paste_keys}' (类型: {type(paste_keys)}, 长度: {len(paste_keys)})")
-        try:
-            self.window.SendKeys(paste_keys, waitTime=0.2)
-            logger.debug("[send_text] 步骤 4: 粘贴成功")
+            self._send_input_sequence(self.window, CLEAR_PASTE_ENTER)
         except Exception as e:
-            logger.error(f"[send_text] 步骤 4: 粘贴失败 - {type(e).__name__}: {e}")
-            logger.error(f"[send_text] 步骤 4: 异常详情", exc_info=True)
+            logger.error("[send_text] %s失败 - %s: %s", _STEP_SEND, type(e).__name__, e)
             return False
 
-        # 步骤 5: 发送消息
-        logger.debug("[send_text] 步骤 5: 准备发送消息")
-        enter_keys = '{ENTER}'
-        logger.debug(f"[send_text] 步骤 5: 按键序列 - '{enter_keys}' (类型: {type(enter_keys)}, 长度: {len(enter_keys)})")
-        try:
-            self.window.SendKeys(enter_keys, waitTime=0.2)
-            logger.debug("[send_text] 步骤 5: 发送成功")
-        except Exception as e:
-            logger.error(f"[send_text] 步骤 5: 发送失败 - {type(e).__name__}: {e}")
-            logger.error(f"[send_text] 步骤 5: 异常详情", exc_info=True)
-            return False
-
-        logger.info(f"✓ 发送成功 (直接焦点方式): {text[:20]}...")
+        logger.info("✓ 发送成功 (直接焦点方式): %.20s...", text)
         return True
 
     def send_image(self, image_path: str) -> bool:
         """发送图片 (通过复制文件到剪贴板)"""
         try:
             from PIL import Image
-            import win32clipboard
-            import io
-
-            # 读取图片并转换为 BMP 格式（Windows 剪贴板支持）
-            img = Image.open(image_path)
-            output = io.BytesIO()
-            img.convert("RGB").save(output, "BMP")
-            data = output.getvalue()[14:]  # 移除 BMP 文件头
-            output.close()
-
-            # 复制到剪贴板
-            win32clipboard.OpenClipboard()
-            win32clipboard.EmptyClipboard()
-            win32clipboard.SetClipboardData(win32clipboard.CF_DIB, data)
-            win32clipboard.CloseClipboard()
+
+            # 读取图片并复制到剪贴板
+            with Image.open(image_path) as img:
+                _set_clipboard_image(img)
 
             # 激活窗口并粘贴
             self.activate_window()
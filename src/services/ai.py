@@ -3,12 +3,53 @@
 AI 服务模块 - 使用 OpenAI API 回复问题
 """
 
+import json
 import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
 import requests
+from requests.adapters import HTTPAdapter
 from config import config
 
 logger = logging.getLogger(__name__)
 
+try:
+    import orjson
+    HAS_ORJSON = True
+except ImportError:
+    HAS_ORJSON = False
+
+
+def _dumps(obj) -> bytes:
+    """序列化请求体（优先使用 orjson）"""
+    if HAS_ORJSON:
+        return orjson.dumps(obj)
+    return json.dumps(obj, ensure_ascii=False).encode('utf-8')
+
+
+def _loads(data: bytes):
+    """解析响应数据（优先使用 orjson）"""
+    if HAS_ORJSON:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+# 缓存的回答条数上限
+_ANSWER_CACHE_SIZE = 256
+
+# 流式回复达到该长度后，遇到句末标点即提前结束
+STREAM_EARLY_STOP_CHARS = 200
+# 中文句末标点和换行可直接判定为句末
+SENTENCE_ENDINGS = ('。', '！', '？', '\n')
+# 英文句末标点可能出现在数字或缩写中（如 "3." "e.g."），后面紧跟空白时才算句末
+ASCII_SENTENCE_ENDINGS = ('.', '!', '?')
+
+DEFAULT_SYSTEM_MESSAGE = {
+    "role": "system",
+    "content": "你是一个友好、有趣的 AI 助手，用简洁、幽默的方式回答问题。"
+}
+
 
 class AIService:
     """AI 服务类，使用 HTTPS 请求与 OpenAI API 交互"""
@@ -20,6 +61,23 @@ class AIService:
             "Authorization": f"Bearer {config.OPENAI_API_KEY}",
             "Content-Type": "application/json"
         }
+        # 复用 TCP/TLS 连接，避免每次提问都重新握手
+        self.session = requests.Session()
+        self.session.headers.update(self.headers)
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=8)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        # 请求体中不随问题变化的部分只构建一次
+        self._payload_base = {
+            "max_tokens": config.OPENAI_MAX_TOKENS,
+            "temperature": config.OPENAI_TEMPERATURE,
+            "stream": True,
+        }
+        # 相同问题复用最近的回答 {(问题, 系统提示词, 模型): 回答}，LRU 淘汰，失败或空回复不缓存
+        self._answers: OrderedDict[tuple, str] = OrderedDict()
+        # 正在请求中的问题 {(问题, 系统提示词, 模型): Future}，同时到来的相同问题只请求一次
+        self._inflight: dict[tuple, Future] = {}
+        self._lock = threading.Lock()
         logger.info(f"AI 服务初始化完成，API: {config.OPENAI_BASE_URL}")
 
     def ask(self, question: str, system_prompt: str = None) -> str:
@@ -34,45 +92,7 @@ class AIService:
             AI 的回复文本，如果失败则返回 None
         """
         try:
-            messages = []
-
-            # 添加系统提示词
-            if system_prompt:
-                messages.append({"role": "system", "content": system_prompt})
-            else:
-                messages.append({
-                    "role": "system",
-                    "content": "你是一个友好、有趣的 AI 助手，用简洁、幽默的方式回答问题。"
-                })
-
-            # 添加用户问题
-            messages.append({"role": "user", "content": question})
-
-            logger.info(f"正在向 AI 提问: {question}")
-
-            # 构建请求数据
-            payload = {
-                "model": config.OPENAI_MODEL,
-                "messages": messages,
-                "max_tokens": config.OPENAI_MAX_TOKENS,
-                "temperature": config.OPENAI_TEMPERATURE,
-            }
-
-            # 发送 HTTPS 请求
-            response = requests.post(
-                self.api_url,
-                headers=self.headers,
-                json=payload,
-                timeout=30
-            )
-            response.raise_for_status()
-
-            # 解析响应
-            data = response.json()
-            answer = data['choices'][0]['message']['content'].strip()
-            logger.info(f"AI 回复: {answer[:100]}...")
-            return answer
-
+            return self._ask_shared((question, system_prompt, config.OPENAI_MODEL))
         except requests.exceptions.RequestException as e:
             logger.error(f"AI 请求失败: {e}")
             return None
@@ -82,3 +102,98 @@ class AIService:
         except Exception as e:
             logger.error(f"AI 请求异常: {e}")
             return None
+
+    def _ask_shared(self, key: tuple) -> str:
+        """优先复用缓存的回答；相同问题已在请求中时等待其结果，否则发起请求（结果和异常都会共享给等待方）"""
+        with self._lock:
+            answer = self._answers.get(key)
+            if answer is not None:
+                self._answers.move_to_end(key)
+                return answer
+            future = self._inflight.get(key)
+            owner = future is None
+            if owner:
+                future = self._inflight[key] = Future()
+        if not owner:
+            return future.result()
+
+        answer = None
+        try:
+            answer = self._request_answer(*key)
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(answer)
+            return answer
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+                if answer:
+                    self._answers[key] = answer
+                    if len(self._answers) > _ANSWER_CACHE_SIZE:
+                        self._answers.popitem(last=False)
+
+    def _request_answer(self, question: str, system_prompt: str, model: str) -> str:
+        """请求 OpenAI API 获取回复，请求失败时抛出异常，回复为空时返回 None"""
+        system = (
+            {"role": "system", "content": system_prompt} if system_prompt
+            else DEFAULT_SYSTEM_MESSAGE
+        )
+        messages = [system, {"role": "user", "content": question}]
+
+        logger.info(f"正在向 AI 提问: {question}")
+
+        payload = {**self._payload_base, "model": model, "messages": messages}
+
+        # 发送 HTTPS 请求（流式读取 SSE）
+        with self.session.post(
+            self.api_url,
+            data=_dumps(payload),
+            timeout=30,
+            stream=True
+        ) as response:
+            response.raise_for_status()
+            answer = self._read_stream(response)
+
+        if not answer:
+            logger.error("AI 响应解析失败: 回复内容为空")
+            return None
+        logger.info(f"AI 回复: {answer[:100]}...")
+        return answer
+
+    def _read_stream(self, response) -> str:
+        """逐块读取流式响应，已有完整句子且足够长时提前返回"""
+        parts = []
+        length = 0
+        # 上一块以英文句末标点结尾，等下一块确认后面是否是空白
+        ascii_ending = False
+        for line in response.iter_lines(decode_unicode=False):
+            if not line or not line.startswith(b"data:"):
+                continue
+            data = line[5:].strip()
+            if data == b"[DONE]":
+                break
+
+            chunk = _loads(data)
+            choices = chunk.get('choices') or []
+            if not choices:
+                continue
+            delta = choices[0].get('delta', {}).get('content')
+            if not delta:
+                continue
+
+            if ascii_ending and delta[0].isspace():
+                break
+            parts.append(delta)
+            length += len(delta)
+            if length > STREAM_EARLY_STOP_CHARS:
+                tail = delta.rstrip(' \t')
+                if tail.endswith(SENTENCE_ENDINGS):
+                    break
+                ascii_ending = tail.endswith(ASCII_SENTENCE_ENDINGS)
+                # 标点后已带空白（如 "end. "）的可直接判定
+                if ascii_ending and tail != delta:
+                    break
+
+        return "".join(parts).strip()
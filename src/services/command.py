@@ -3,41 +3,114 @@
 动态加载和管理来自 API 的命令
 """
 
+import os
+import re
 import requests
 import logging
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from typing import Dict, List, Optional, Tuple
 from config import config
 
+try:
+    import orjson
+    HAS_ORJSON = True
+except ImportError:
+    HAS_ORJSON = False
+
+try:
+    import ahocorasick
+    HAS_AHOCORASICK = True
+except ImportError:
+    HAS_AHOCORASICK = False
+
+try:
+    from requests_cache import CachedSession, DO_NOT_CACHE
+    HAS_REQUESTS_CACHE = True
+except ImportError:
+    HAS_REQUESTS_CACHE = False
+
 logger = logging.getLogger(__name__)
 
+# HTTP 缓存文件位置（项目根目录下的 cache/）
+CACHE_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+    'cache',
+    'commands'
+)
+
 
 class CommandService:
     """管理动态命令的服务类"""
 
     def __init__(self):
         self.api_base_url = config.COMMAND_API_BASE_URL
+        self.session = self._create_session()
         self.commands: List[Dict] = []
-        self.command_keys: List[str] = []
-
-    def load_commands(self) -> bool:
+        self.command_keys: Tuple[str, ...] = ()
+        # 命令列表版本号，每次加载成功后递增（供调用方做缓存失效）
+        self.version = 0
+        # 匹配索引（在 load_commands 中构建）
+        self._matcher: Optional[re.Pattern] = None
+        self._automaton = None
+        self._key_by_lower: Dict[str, str] = {}
+
+    def _create_session(self) -> requests.Session:
+        """创建 HTTP 会话（连接池复用），安装了 requests-cache 时启用响应缓存"""
+        if HAS_REQUESTS_CACHE:
+            os.makedirs(os.path.dirname(CACHE_PATH), exist_ok=True)
+            session = self._create_cached_session()
+        else:
+            session = requests.Session()
+
+        # 连接失败或网关错误时短暂退避重试，不必等到下一次触发
+        retry = Retry(total=2, backoff_factor=0.2, status_forcelist=[502, 503, 504])
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=8, max_retries=retry)
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        session.headers.update({'accept': 'application/json'})
+        return session
+
+    def _create_cached_session(self) -> requests.Session:
+        """创建带响应缓存的会话"""
+        # 只缓存命令列表（1 小时）和服务端通过 Cache-Control/ETag 声明可缓存的响应；
+        # 命令结果可能是随机的（图片、笑话等），默认不缓存
+        return CachedSession(
+            CACHE_PATH,
+            backend='sqlite',
+            cache_control=True,
+            expire_after=DO_NOT_CACHE,
+            urls_expire_after={
+                f"{self.api_base_url}/command/hp": 3600,
+            }
+        )
+
+    def load_commands(self, refresh: bool = False) -> bool:
         """
         从 API 加载命令列表
 
+        Args:
+            refresh: 是否忽略缓存强制重新拉取
+
         Returns:
             bool: 是否成功加载
         """
         try:
-            response = requests.get(
+            kwargs = {'force_refresh': True} if refresh and HAS_REQUESTS_CACHE else {}
+            response = self.session.get(
                 f"{self.api_base_url}/command/hp",
-                headers={'accept': 'application/json'},
-                timeout=30
+                timeout=30,
+                **kwargs
             )
             response.raise_for_status()
 
             # 加载命令列表并过滤掉 'hp' 命令
-            all_commands = response.json()
+            all_commands = orjson.loads(response.content) if HAS_ORJSON else response.json()
             self.commands = [cmd for cmd in all_commands if cmd['key'].strip().lower() != 'hp']
-            self.command_keys = [cmd['key'] for cmd in self.commands]
+            # 命令列表只在加载时变化，冻结为元组，供匹配和自动机构建直接复用
+            self.command_keys = tuple(cmd['key'] for cmd in self.commands)
+            self._build_index()
+            self.version += 1
 
             logger.info(f"成功加载 {len(self.commands)} 个命令")
             logger.info(f"命令列表: {self.command_keys}")
@@ -47,6 +120,32 @@ class CommandService:
             logger.error(f"加载命令列表失败: {e}")
             return False
 
+    def _build_index(self):
+        """把所有命令编译成一个正则（安装了 pyahocorasick 时改用自动机），匹配时只需扫描一次输入"""
+        self._key_by_lower = {key.lower(): key for key in self.command_keys}
+        self._automaton = None
+        if not self.command_keys:
+            self._matcher = None
+            return
+        if HAS_AHOCORASICK:
+            automaton = ahocorasick.Automaton()
+            for key_lower in self._key_by_lower:
+                automaton.add_word(key_lower, key_lower)
+            automaton.make_automaton()
+            self._automaton = automaton
+            # 命令只匹配开头，扫描到最长命令的长度即可
+            self._max_key_len = max(len(key_lower) for key_lower in self._key_by_lower)
+            self._matcher = None
+            return
+        # 按 key 长度从长到短排列分支，优先匹配长的命令（避免 "s" 匹配到 "ss"）
+        alternatives = '|'.join(
+            re.escape(key) for key in sorted(self.command_keys, key=len, reverse=True)
+        )
+        self._matcher = re.compile(
+            rf'(?P<cmd>{alternatives})(?P<params>.*)\Z',
+            re.IGNORECASE | re.DOTALL
+        )
+
     def match_command(self, text: str) -> Optional[Tuple[str, str]]:
         """
         匹配命令
@@ -59,22 +158,46 @@ class CommandService:
             - command_key: 命令的 key
             - params: 命令参数（如果有）
         """
-        text_lower = text.lower().strip()
-        logger.debug(f"尝试匹配命令: '{text_lower}'")
-
-        # 按 key 长度从长到短排序，优先匹配长的命令（避免 "s" 匹配到 "ss"）
-        sorted_keys = sorted(self.command_keys, key=len, reverse=True)
-
-        for key in sorted_keys:
-            key_lower = key.lower()
-
-            # 前缀匹配
-            if text_lower.startswith(key_lower):
-                params = text[len(key):].strip()
-                logger.debug(f"匹配成功: 命令='{key}', 参数='{params}'")
+        text = text.strip()
+        logger.debug("尝试匹配命令: '%s'", text)
+
+        if self._automaton is not None:
+            prefix = text[:self._max_key_len]
+            lowered = prefix.lower()
+            # lower() 可能改变长度（如 'İ'），此时记录小写串中每个字符边界对应的原文下标，参数按原文下标切分
+            boundaries = None
+            if len(lowered) != len(prefix):
+                boundaries = {}
+                pos = 0
+                for i, ch in enumerate(prefix):
+                    pos += len(ch.lower())
+                    boundaries[pos] = i + 1
+            # 只保留从开头起的匹配，取最长的命令
+            key = None
+            key_end = 0
+            for end, word in self._automaton.iter(lowered):
+                if end + 1 != len(word) or (key is not None and len(word) <= len(key)):
+                    continue
+                cut = end + 1 if boundaries is None else boundaries.get(end + 1)
+                # 匹配结束在某个原文字符的小写形式中间，不算匹配
+                if cut is not None:
+                    key, key_end = word, cut
+            if key is not None:
+                params = text[key_end:].strip()
+                key = self._key_by_lower[key]
+                logger.debug("匹配成功: 命令='%s', 参数='%s'", key, params)
                 return (key, params)
+            logger.debug("未找到匹配的命令")
+            return None
+
+        m = self._matcher.match(text) if self._matcher else None
+        if m:
+            key = self._key_by_lower.get(m['cmd'].lower(), m['cmd'])
+            params = m['params'].strip()
+            logger.debug("匹配成功: 命令='%s', 参数='%s'", key, params)
+            return (key, params)
 
-        logger.debug(f"未找到匹配的命令")
+        logger.debug("未找到匹配的命令")
         return None
 
     def execute_command(self, command_key: str, params: str = "") -> Optional[str]:
@@ -102,16 +225,15 @@ class CommandService:
 
             logger.info(f"调用命令 API: {url} with params: {query_params}")
 
-            response = requests.get(
+            response = self.session.get(
                 url,
                 params=query_params,
-                headers={'accept': 'application/json'},
                 timeout=30
             )
             response.raise_for_status()
 
             # 解析响应 - API 返回格式 {"content": "...", "type": "text"}
-            data = response.json()
+            data = orjson.loads(response.content) if HAS_ORJSON else response.json()
             response_content = data.get('content', '')
 
             # DEBUG 模式：打印 API 返回值
@@ -124,25 +246,6 @@ class CommandService:
             logger.error(f"执行命令 {command_key} 失败: {e}")
             return None
 
-    def _format_response(self, data) -> str:
-        """格式化 API 响应为可读文本"""
-        if isinstance(data, str):
-            return data
-        elif isinstance(data, list):
-            # 数组类型，逐行显示
-            return '\n'.join(str(item) for item in data)
-        elif isinstance(data, dict):
-            # 字典类型，格式化显示
-            lines = []
-            for key, value in data.items():
-                if isinstance(value, (dict, list)):
-                    lines.append(f"{key}: {str(value)}")
-                else:
-                    lines.append(f"{key}: {value}")
-            return '\n'.join(lines)
-        else:
-            return str(data)
-
     def get_help_text(self) -> str:
         """获取命令帮助文本"""
         if not self.commands:
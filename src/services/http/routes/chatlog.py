@@ -23,10 +23,10 @@ router = APIRouter(prefix="/api/chatlog", tags=["chatlog"])
 
 
 def create_routes():
-    """创建路由"""
+    """创建路由（解密和查询都是阻塞的文件/数据库操作，声明为普通函数，由 FastAPI 放到线程池执行）"""
 
     @router.post("/decrypt", dependencies=[Depends(verify_token)])
-    async def decrypt_database(request: ChatlogDecryptRequest):
+    def decrypt_database(request: ChatlogDecryptRequest):
         """解密微信数据库"""
         if not HAS_CRYPTO:
             raise HTTPException(status_code=500, detail="服务器缺少 pycryptodome 依赖")
@@ -51,7 +51,7 @@ def create_routes():
             raise HTTPException(status_code=500, detail=f"解密失败: {str(e)}")
 
     @router.get("/groups", response_model=List[ChatlogGroupResponse], dependencies=[Depends(verify_token)])
-    async def list_chat_groups(
+    def list_chat_groups(
         db_path: str = Query(..., description="解密后的数据库目录"),
         limit: int = Query(0, description="限制返回数量，0 表示不限制")
     ):
@@ -81,7 +81,7 @@ def create_routes():
             reader.close()
 
     @router.get("/messages", response_model=List[ChatlogMessageResponse], dependencies=[Depends(verify_token)])
-    async def query_messages(
+    def query_messages(
         db_path: str = Query(..., description="解密后的数据库目录"),
         group: str = Query(..., description="群聊ID 或个人微信ID"),
         start: Optional[str] = Query(None, description="开始时间 (YYYY-MM-DD 或 YYYY-MM-DD HH:MM:SS)"),
@@ -2,6 +2,7 @@
 群组路由
 """
 
+import asyncio
 import logging
 
 from fastapi import APIRouter, Depends
@@ -19,14 +20,18 @@ def create_routes(bot_instance):
     @router.get("/api/groups", response_model=list[GroupInfo], dependencies=[Depends(verify_token)])
     async def list_groups():
         """列出所有聊天窗口"""
-        groups = []
-        for group in bot_instance.groups:
+        def _check(group) -> GroupInfo:
             try:
-                is_active = group["window"].Exists(0.5)
-                groups.append(GroupInfo(name=group["name"], active=is_active))
+                is_active = bot_instance.is_window_alive(group["name"], group["window"])
             except Exception as e:
                 logger.error(f"检查群组 {group['name']} 状态失败: {e}")
-                groups.append(GroupInfo(name=group["name"], active=False))
-        return groups
+                is_active = False
+            return GroupInfo(name=group["name"], active=is_active)
+
+        # 各窗口检查互不依赖，放到线程池并发执行，不阻塞事件循环
+        loop = asyncio.get_running_loop()
+        return await asyncio.gather(*[
+            loop.run_in_executor(None, _check, group) for group in bot_instance.groups
+        ])
 
     return router
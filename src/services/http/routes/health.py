@@ -14,33 +14,47 @@ from config import config
 router = APIRouter()
 
 
+def _load_index_html() -> str:
+    """读取首页模板"""
+    template_path = os.path.join(
+        os.path.dirname(os.path.dirname(__file__)),
+        'templates',
+        'index.html'
+    )
+    try:
+        with open(template_path, 'r', encoding='utf-8') as f:
+            return f.read()
+    except FileNotFoundError:
+        return "<h1>模板文件未找到</h1>"
+
+
 def create_routes(bot_instance):
     """创建路由"""
+    # 模板在启动时读取并编码一次，之后每次请求直接返回字节，不再逐次编码
+    index_html = _load_index_html().encode('utf-8')
+    index_headers = {"Cache-Control": "public, max-age=300"}
 
     @router.get("/", response_class=HTMLResponse)
     async def root():
         """Web UI 首页"""
-        template_path = os.path.join(
-            os.path.dirname(os.path.dirname(__file__)),
-            'templates',
-            'index.html'
-        )
-        try:
-            with open(template_path, 'r', encoding='utf-8') as f:
-                return f.read()
-        except FileNotFoundError:
-            return "<h1>模板文件未找到</h1>"
+        return HTMLResponse(index_html, headers=index_headers)
+
+    # 鉴权配置在进程内不变，只计算一次
+    auth_enabled = bool(config.HTTP_API_TOKEN)
 
     @router.get("/api/health")
     async def health():
         """健康检查"""
+        # 时区名称和偏移会随夏令时变化，不能缓存；由同一个时间结构格式化，只读取一次时钟
+        now = time.time()
+        local = time.localtime(now)
         return {
             "status": "healthy",
             "groups_count": len(bot_instance.groups),
-            "server_time": datetime.now().isoformat(),
-            "timezone": time.strftime("%Z"),
-            "timezone_offset": time.strftime("%z"),
-            "auth_enabled": bool(config.HTTP_API_TOKEN)
+            "server_time": datetime.fromtimestamp(now).isoformat(),
+            "timezone": time.strftime("%Z", local),
+            "timezone_offset": time.strftime("%z", local),
+            "auth_enabled": auth_enabled
         }
 
     return router
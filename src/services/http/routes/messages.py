@@ -2,6 +2,7 @@
 消息发送路由
 """
 
+import asyncio
 import logging
 import queue
 import time
@@ -24,16 +25,15 @@ def create_routes(bot_instance):
         if not request.message and not request.image_base64:
             raise HTTPException(status_code=400, detail="必须提供 message 或 image_base64 参数")
 
-        target_group = None
-        for group in bot_instance.groups:
-            if group["name"] == request.group_name:
-                target_group = group
-                break
-
+        target_group = bot_instance.groups_by_name.get(request.group_name)
         if not target_group:
             raise HTTPException(status_code=404, detail=f"未找到群组: {request.group_name}")
 
-        if not target_group["window"].Exists(0.5):
+        # 窗口检查是阻塞的 UI 自动化调用，放到线程池执行
+        alive = await asyncio.get_running_loop().run_in_executor(
+            None, bot_instance.is_window_alive, target_group["name"], target_group["window"]
+        )
+        if not alive:
             raise HTTPException(status_code=400, detail=f"群组窗口已关闭: {request.group_name}")
 
         try:
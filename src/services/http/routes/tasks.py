@@ -17,11 +17,6 @@ router = APIRouter()
 
 def _task_to_response(task) -> ScheduledTaskResponse:
     """将任务对象转换为响应模型"""
-    try:
-        target_groups = json.loads(task.target_groups) if task.target_groups else []
-    except json.JSONDecodeError:
-        target_groups = []
-
     return ScheduledTaskResponse(
         id=task.id,
         name=task.name,
@@ -29,7 +24,7 @@ def _task_to_response(task) -> ScheduledTaskResponse:
         message=task.message,
         message_type=task.message_type,
         image_base64=task.image_base64 if task.message_type == "image" else "",
-        target_groups=target_groups,
+        target_groups=task.target_group_names,
         enabled=task.enabled,
         created_at=task.created_at,
         updated_at=task.updated_at,
@@ -38,16 +33,16 @@ def _task_to_response(task) -> ScheduledTaskResponse:
 
 
 def create_routes(task_service):
-    """创建路由"""
+    """创建路由（处理函数都要访问 SQLite，声明为普通函数，由 FastAPI 放到线程池执行，不阻塞事件循环）"""
 
     @router.get("/api/tasks", response_model=List[ScheduledTaskResponse], dependencies=[Depends(verify_token)])
-    async def list_scheduled_tasks():
+    def list_scheduled_tasks():
         """获取所有定时任务"""
         tasks = task_service.get_all_tasks()
         return [_task_to_response(task) for task in tasks]
 
     @router.post("/api/tasks", response_model=ScheduledTaskResponse, dependencies=[Depends(verify_token)])
-    async def create_scheduled_task(request: ScheduledTaskCreate):
+    def create_scheduled_task(request: ScheduledTaskCreate):
         """创建定时任务"""
         target_groups_json = json.dumps(request.target_groups, ensure_ascii=False)
         task = task_service.create_task(
@@ -67,7 +62,7 @@ def create_routes(task_service):
         return _task_to_response(task)
 
     @router.get("/api/tasks/{task_id}", response_model=ScheduledTaskResponse, dependencies=[Depends(verify_token)])
-    async def get_scheduled_task(task_id: int):
+    def get_scheduled_task(task_id: int):
         """获取指定定时任务"""
         task = task_service.get_task(task_id)
         if not task:
@@ -75,7 +70,7 @@ def create_routes(task_service):
         return _task_to_response(task)
 
     @router.put("/api/tasks/{task_id}", response_model=ScheduledTaskResponse, dependencies=[Depends(verify_token)])
-    async def update_scheduled_task(task_id: int, request: ScheduledTaskUpdate):
+    def update_scheduled_task(task_id: int, request: ScheduledTaskUpdate):
         """更新定时任务"""
         task = task_service.get_task(task_id)
         if not task:
@@ -106,7 +101,7 @@ def create_routes(task_service):
         return _task_to_response(updated_task)
 
     @router.delete("/api/tasks/{task_id}", dependencies=[Depends(verify_token)])
-    async def delete_scheduled_task(task_id: int):
+    def delete_scheduled_task(task_id: int):
         """删除定时任务"""
         task = task_service.get_task(task_id)
         if not task:
@@ -2,8 +2,11 @@
 定时任务调度器
 """
 
+import asyncio
+import contextlib
 import json
 import logging
+import queue
 import threading
 import time
 from datetime import datetime
@@ -12,51 +15,115 @@ from .models import ChatSummaryRequest
 
 logger = logging.getLogger(__name__)
 
+# 调度循环最长等待时间（秒）：任务增删改时会立即唤醒，这里只是兜底（如系统时间被调整）
+_MAX_WAIT = 60.0
+# 调度出错后的重试间隔（秒）
+_RETRY_INTERVAL = 5.0
+
 
 class TaskScheduler:
-    """定时任务调度器"""
+    """定时任务调度器（作为 asyncio 任务运行在 HTTP 服务的事件循环中）"""
 
     def __init__(self, task_service, bot_instance):
         self.task_service = task_service
         self.bot = bot_instance
         self.running = False
-        self.thread = None
         self.execution_lock = threading.Lock()
         self.executing_tasks = set()
+        # 调度任务及其所在事件循环，在 start() 中创建
+        self._task = None
+        self._event_loop = None
+        # 停止调度或任务被增删改时唤醒调度循环
+        self._wake_event = None
+        task_service.add_change_listener(self._wake)
+        # {task.id: (cron 表达式, 下次执行时间)}，未到时间的任务不再逐次解析 cron
+        self._next_due = {}
+        # 上一轮检查时的任务数据版本号和最早的下次执行时间，两者都没变化时跳过整轮检查
+        self._checked_version = None
+        self._earliest_due = None
 
     def start(self):
-        """启动调度器"""
+        """启动调度器（需在事件循环中调用）"""
+        self._event_loop = asyncio.get_running_loop()
+        self._wake_event = asyncio.Event()
         self.running = True
-        self.thread = threading.Thread(target=self._loop, daemon=True)
-        self.thread.start()
+        self._task = asyncio.create_task(self._loop())
         logger.info("定时任务调度器已启动")
 
-    def stop(self):
+    async def stop(self):
         """停止调度器"""
         self.running = False
-        if self.thread:
-            self.thread.join(timeout=5)
+        if self._task:
+            self._task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._task
         logger.info("定时任务调度器已停止")
 
-    def _loop(self):
+    def _wake(self):
+        """任务被增删改时唤醒调度循环（路由在线程池中执行，需线程安全地投递到事件循环）"""
+        if self._event_loop is not None and not self._event_loop.is_closed():
+            self._event_loop.call_soon_threadsafe(self._wake_event.set)
+
+    async def _loop(self):
         """调度循环"""
-        logger.info("定时任务调度线程启动")
+        logger.info("定时任务调度循环启动")
+        loop = asyncio.get_running_loop()
 
         while self.running:
             try:
+                # 先清除唤醒标记再读取版本号，之后的修改会让下一次等待立即返回
+                self._wake_event.clear()
                 current_time = datetime.now()
-                tasks = self.task_service.get_enabled_tasks()
+                version = self.task_service.version
+                if version == self._checked_version and (
+                        self._earliest_due is None or current_time < self._earliest_due):
+                    await self._wait_until_due()
+                    continue
+
+                # 读数据库和发送消息是阻塞操作，放到线程池执行
+                tasks = await loop.run_in_executor(None, self.task_service.get_enabled_tasks)
+                next_due = {}
 
                 for task in tasks:
-                    if self.task_service.should_run(task, current_time):
-                        self._execute_task(task)
+                    cached = self._next_due.get(task.id)
+                    if cached and cached[0] == task.cron_expression and current_time < cached[1]:
+                        next_due[task.id] = cached
+                        continue
 
-                time.sleep(5)
+                    if self.task_service.should_run(task, current_time):
+                        await loop.run_in_executor(None, self._execute_task, task)
+
+                    due = self.task_service.get_next_run(task, current_time)
+                    if due is not None:
+                        next_due[task.id] = (task.cron_expression, due)
+
+                # 已删除/禁用的任务随之移出缓存
+                self._next_due = next_due
+                self._earliest_due = min((due for _, due in next_due.values()), default=None)
+                # 本轮开始时的版本号：执行任务时写入的 last_run 会让下一轮重新检查
+                self._checked_version = version
+                await self._wait_until_due()
+            except asyncio.CancelledError:
+                break
             except Exception as e:
                 logger.error(f"定时任务调度出错: {e}", exc_info=True)
-                time.sleep(5)
+                await self._wait(_RETRY_INTERVAL)
+
+        logger.info("定时任务调度循环退出")
 
-        logger.info("定时任务调度线程退出")
+    async def _wait_until_due(self):
+        """等到最近一个任务到期或任务被修改，最多 _MAX_WAIT 秒"""
+        wait = _MAX_WAIT
+        if self._earliest_due is not None:
+            wait = min(wait, max((self._earliest_due - datetime.now()).total_seconds(), 0.0))
+        await self._wait(wait)
+
+    async def _wait(self, timeout: float):
+        """等待唤醒，最多 timeout 秒"""
+        try:
+            await asyncio.wait_for(self._wake_event.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
 
     def _execute_task(self, task):
         """执行任务"""
@@ -75,30 +142,32 @@ class TaskScheduler:
                 self._execute_summary_task(task)
                 return
 
-            try:
-                target_groups = json.loads(task.target_groups) if task.target_groups else []
-            except json.JSONDecodeError:
-                target_groups = []
+            target_groups = task.target_group_names
 
             if not target_groups:
                 groups_to_send = self.bot.groups
             else:
-                groups_to_send = [g for g in self.bot.groups if g["name"] in target_groups]
+                groups_by_name = self.bot.groups_by_name
+                groups_to_send = [groups_by_name[name] for name in dict.fromkeys(target_groups) if name in groups_by_name]
 
+            # 与 /api/send 一样放入机器人的发送队列，由处理线程检查窗口并串行发送，调度不必等待发送完成
+            if task.message_type == "image":
+                message_type, content = "image", task.image_base64
+            else:
+                message_type, content = "text", task.message
             for group in groups_to_send:
-                if not group["window"].Exists(0.5):
-                    logger.debug(f"群 [{group['name']}] 窗口已关闭，跳过")
-                    continue
-
                 try:
-                    if task.message_type == "image":
-                        self.bot.wechat.send_image_to_window(group["window"], task.image_base64)
-                        logger.info(f"[Scheduler] 定时任务图片已发送到 [{group['name']}]")
-                    else:
-                        self.bot.wechat.send_text_to_window(group["window"], task.message)
-                        logger.info(f"[Scheduler] 定时任务消息已发送到 [{group['name']}]")
-                except Exception as e:
-                    logger.error(f"[Scheduler] 定时任务发送失败 [{group['name']}]: {e}")
+                    self.bot.message_queue.put_nowait({
+                        'type': message_type,
+                        'group_name': group["name"],
+                        'window': group["window"],
+                        'content': content,
+                        'timestamp': time.time()
+                    })
+                    logger.info(f"[Scheduler] 定时任务消息已加入队列，目标: [{group['name']}]")
+                except queue.Full:
+                    logger.warning(f"[Scheduler] 消息队列已满，定时任务 {task.name} 剩余的群不再发送")
+                    break
         finally:
             # summary 类型任务由回调处理 task.id 移除，其他类型在此处移除
             if task.message_type != "summary":
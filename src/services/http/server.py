@@ -2,9 +2,13 @@
 HTTP API 服务器
 """
 
+import asyncio
 import logging
 import os
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
 
+import anyio.to_thread
 from fastapi import FastAPI
 import uvicorn
 
@@ -14,6 +18,9 @@ from .routes import health, groups, messages, tasks, chatlog
 
 logger = logging.getLogger(__name__)
 
+# 接口中阻塞操作（UI 自动化、SQLite、文件解密）使用的线程数上限
+_API_WORKERS = 8
+
 
 class HTTPServer:
     """HTTP API 服务器"""
@@ -23,7 +30,8 @@ class HTTPServer:
         self.app = FastAPI(
             title="AWSL WeChat Bot API",
             description="微信机器人 HTTP API 服务",
-            version="1.0.0"
+            version="1.0.0",
+            lifespan=self._lifespan
         )
 
         # 初始化定时任务服务
@@ -38,6 +46,22 @@ class HTTPServer:
 
         self._setup_routes()
 
+    @asynccontextmanager
+    async def _lifespan(self, app: FastAPI):
+        """服务启动时限制接口线程池大小并启动定时任务调度，关闭时停止调度
+
+        线程池包括 run_in_executor 使用的默认线程池和 FastAPI 执行普通函数路由的线程池。
+        """
+        asyncio.get_running_loop().set_default_executor(
+            ThreadPoolExecutor(max_workers=_API_WORKERS, thread_name_prefix="awsl-api")
+        )
+        anyio.to_thread.current_default_thread_limiter().total_tokens = _API_WORKERS
+        self.scheduler.start()
+        try:
+            yield
+        finally:
+            await self.scheduler.stop()
+
     def _setup_routes(self):
         """设置路由"""
         # 健康检查和首页
@@ -57,6 +81,5 @@ class HTTPServer:
 
     def run(self, host: str = "0.0.0.0", port: int = 8000):
         """运行 HTTP 服务器"""
-        self.scheduler.start()
         logger.info(f"启动 HTTP API 服务器: http://{host}:{port}")
         uvicorn.run(self.app, host=host, port=port, log_level="info")
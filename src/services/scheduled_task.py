@@ -3,11 +3,13 @@
 支持基于 cron 表达式的定时任务管理
 """
 
+import json
 import logging
 import sqlite3
 import threading
 from datetime import datetime
-from typing import Optional, List, Dict
+from functools import cached_property
+from typing import Callable, Optional, List, Dict
 from croniter import croniter
 
 logger = logging.getLogger(__name__)
@@ -42,6 +44,17 @@ class ScheduledTask:
         self.updated_at = updated_at
         self.last_run = last_run
 
+    @cached_property
+    def target_group_names(self) -> List[str]:
+        """解析后的目标群名列表（空列表表示所有群）
+
+        任务对象在任务列表缓存中跨请求复用，每个任务只解析一次（调用方不应修改返回的列表）。
+        """
+        try:
+            return json.loads(self.target_groups) if self.target_groups else []
+        except json.JSONDecodeError:
+            return []
+
     def to_dict(self) -> dict:
         """转换为字典"""
         return {
@@ -74,12 +87,31 @@ class ScheduledTaskService:
 
         # 启用 WAL 模式以支持并发读写
         self.conn.execute('PRAGMA journal_mode=WAL')
+        # WAL 下 NORMAL 同步级别即可保证一致性，避免每次提交（如 update_last_run）都 fsync
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.execute('PRAGMA temp_store=MEMORY')
         # 设置更短的超时时间
         self.conn.execute('PRAGMA busy_timeout=5000')
 
         self.db_lock = threading.Lock()
+        # 任务数据版本号，每次写入后加一（任务列表缓存随之失效，调用方也可据此判断任务是否变化）
+        self.version = 0
+        # 任务列表缓存 (版本号, 全部任务)
+        self._tasks_cache: Optional[tuple] = None
+        # 任务被增删改时的回调（如唤醒调度器重新计算下次执行时间）
+        self._change_listeners: List[Callable[[], None]] = []
         self._init_db()
 
+    def add_change_listener(self, callback: Callable[[], None]):
+        """注册任务被创建、修改或删除后的回调"""
+        self._change_listeners.append(callback)
+
+    def _notify_changed(self):
+        """任务被增删改后递增版本号并通知回调（在 db_lock 内调用）"""
+        self.version += 1
+        for callback in self._change_listeners:
+            callback()
+
     def _init_db(self):
         """初始化数据库表"""
         with self.db_lock:
@@ -181,6 +213,7 @@ class ScheduledTaskService:
                     (name, cron_expression, message, message_type, image_base64, target_groups, 1 if enabled else 0)
                 )
                 self.conn.commit()
+                self._notify_changed()
                 task_id = cursor.lastrowid
 
                 # 返回创建的任务
@@ -216,10 +249,14 @@ class ScheduledTaskService:
         Returns:
             任务列表
         """
-        # 读操作不需要锁，WAL 模式支持并发读
-        cursor = self.conn.execute('SELECT * FROM scheduled_tasks ORDER BY id DESC')
-        rows = cursor.fetchall()
-        return [self._row_to_task(row) for row in rows]
+        # 读操作不需要锁，WAL 模式支持并发读；先取版本号再查询，查询期间有写入时缓存不会被当作最新
+        version = self.version
+        cached = self._tasks_cache
+        if cached is None or cached[0] != version:
+            cursor = self.conn.execute('SELECT * FROM scheduled_tasks ORDER BY id DESC')
+            cached = (version, [self._row_to_task(row) for row in cursor.fetchall()])
+            self._tasks_cache = cached
+        return list(cached[1])
 
     def get_enabled_tasks(self) -> List[ScheduledTask]:
         """
@@ -228,12 +265,8 @@ class ScheduledTaskService:
         Returns:
             已启用的任务列表
         """
-        # 读操作不需要锁，WAL 模式支持并发读
-        cursor = self.conn.execute(
-            'SELECT * FROM scheduled_tasks WHERE enabled = 1 ORDER BY id'
-        )
-        rows = cursor.fetchall()
-        return [self._row_to_task(row) for row in rows]
+        # 由任务列表缓存筛选（缓存按 id 降序），调度器轮询时不必每次查询数据库
+        return [task for task in reversed(self.get_all_tasks()) if task.enabled]
 
     def update_task(
         self,
@@ -304,6 +337,7 @@ class ScheduledTaskService:
                 query = f"UPDATE scheduled_tasks SET {', '.join(updates)} WHERE id = ?"
                 self.conn.execute(query, params)
                 self.conn.commit()
+                self._notify_changed()
                 return True
             except sqlite3.Error as e:
                 logger.error(f"更新定时任务失败: {e}")
@@ -323,6 +357,7 @@ class ScheduledTaskService:
             try:
                 self.conn.execute('DELETE FROM scheduled_tasks WHERE id = ?', (task_id,))
                 self.conn.commit()
+                self._notify_changed()
                 return True
             except sqlite3.Error as e:
                 logger.error(f"删除定时任务失败: {e}")
@@ -343,6 +378,7 @@ class ScheduledTaskService:
                     (task_id,)
                 )
                 self.conn.commit()
+                self.version += 1
             except sqlite3.Error as e:
                 logger.error(f"更新任务运行时间失败: {e}")
 
@@ -404,6 +440,23 @@ class ScheduledTaskService:
             logger.error(f"检查任务 {task.id} 运行时间失败: {e}")
             return False
 
+    def get_next_run(self, task: ScheduledTask, current_time: datetime) -> Optional[datetime]:
+        """
+        计算任务在 current_time 之后的下一次执行时间
+
+        Args:
+            task: 任务对象
+            current_time: 当前本地时间
+
+        Returns:
+            下一次执行的本地时间，cron 表达式无效时返回 None
+        """
+        try:
+            return croniter(task.cron_expression, current_time).get_next(datetime)
+        except Exception as e:
+            logger.error(f"计算任务 {task.id} 下次运行时间失败: {e}")
+            return None
+
     def _row_to_task(self, row: tuple) -> ScheduledTask:
         """
         将数据库行转换为任务对象
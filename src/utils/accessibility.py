@@ -5,11 +5,176 @@ Accessibility API 工具 - 使用 macOS Accessibility API 获取微信消息
 
 import subprocess
 import os
+import functools
 import logging
-from config import config
+from config import APPLESCRIPT_TIMEOUT_MEDIUM
 
 logger = logging.getLogger(__name__)
 
+try:
+    from ApplicationServices import (
+        AXUIElementCreateApplication,
+        AXUIElementCopyAttributeValue,
+        kAXErrorSuccess,
+    )
+    HAS_AX = True
+except ImportError:
+    HAS_AX = False
+
+
+def _ax_attr(elem, name: str):
+    """读取 AX 属性，失败返回 (错误码, None)"""
+    err, value = AXUIElementCopyAttributeValue(elem, name, None)
+    return err, (value if err == kAXErrorSuccess else None)
+
+
+def resolve_messages_list(pid: int, max_depth: int = 10):
+    """
+    在微信主窗口中查找消息列表元素（AXList，标题为 Messages）
+
+    Args:
+        pid: 微信进程 PID
+        max_depth: 最大搜索深度
+
+    Returns:
+        AXUIElement，未找到返回 None
+    """
+    app = AXUIElementCreateApplication(pid)
+    _, windows = _ax_attr(app, "AXWindows")
+    if not windows:
+        return None
+
+    # 广度优先，消息列表通常在较浅的层级
+    level = [windows[0]]
+    for _ in range(max_depth + 1):
+        next_level = []
+        for elem in level:
+            _, role = _ax_attr(elem, "AXRole")
+            if role == "AXList":
+                _, title = _ax_attr(elem, "AXTitle")
+                if title == "Messages":
+                    return elem
+            _, children = _ax_attr(elem, "AXChildren")
+            if children:
+                next_level.extend(children)
+        if not next_level:
+            break
+        level = next_level
+    return None
+
+
+# 判断消息列表是否变化时比较的末尾消息条数
+_SIGNATURE_TAIL = 3
+
+# 输入框类元素的角色
+_TEXT_INPUT_ROLES = frozenset({"AXTextField", "AXSearchField", "AXTextArea"})
+
+
+def get_messages_from_element(messages_list, cache: dict = None) -> list:
+    """
+    只遍历消息列表子树读取消息
+
+    Args:
+        messages_list: resolve_messages_list 返回的元素
+        cache: 可选的缓存字典；子项数量、首条和最后几条消息都未变化时直接返回上次结果
+
+    Returns:
+        list: 消息文本列表；元素已失效时返回 None
+    """
+    err, children = _ax_attr(messages_list, "AXChildren")
+    if err != kAXErrorSuccess:
+        return None
+    # NSArray 转成元组，便于切片取首尾
+    children = tuple(children or ())
+
+    # 先用少量 AX 调用判断列表是否有变化，没变化就跳过逐条读取
+    # 微信的列表行数固定、行会复用，只看最后一条时连续两条相同消息（如两个 "awsl"）会被误判为没变化；
+    # 新消息会让所有行上移，首条和最后几条一起比较才能发现
+    signature = None
+    if cache is not None:
+        probe = children[:1] + children[-_SIGNATURE_TAIL:]
+        signature = (len(children),) + tuple(_ax_attr(child, "AXTitle")[1] for child in probe)
+        if cache.get('signature') == signature:
+            return cache['messages']
+
+    messages = []
+    for child in children:
+        _, title = _ax_attr(child, "AXTitle")
+        if title:
+            messages.append(str(title).strip())
+    messages = [msg for msg in messages if msg]
+
+    if cache is not None:
+        cache['signature'] = signature
+        cache['messages'] = messages
+    return messages
+
+
+def get_focused_element(pid: int):
+    """
+    获取应用当前的焦点元素
+
+    Returns:
+        AXUIElement，没有焦点元素时返回 None
+    """
+    return _ax_attr(AXUIElementCreateApplication(pid), "AXFocusedUIElement")[1]
+
+
+def is_text_input_focused(pid: int) -> bool:
+    """焦点是否在输入框类元素（文本框、搜索框、多行输入框）上"""
+    focused = get_focused_element(pid)
+    return focused is not None and _ax_attr(focused, "AXRole")[1] in _TEXT_INPUT_ROLES
+
+
+def get_focused_value(pid: int):
+    """
+    读取应用当前焦点元素的文本值（如输入框内容）
+
+    Returns:
+        str: 焦点元素的值；无焦点元素或值不是文本时返回 None
+    """
+    focused = get_focused_element(pid)
+    if focused is None:
+        return None
+    _, value = _ax_attr(focused, "AXValue")
+    return str(value) if value is not None else None
+
+
+SCRIPT_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(__file__)),
+    'scripts',
+    'get_messages.applescript'
+)
+
+# 编译后的脚本缓存目录
+SCRIPT_CACHE_DIR = os.path.expanduser("~/.cache/awsl")
+
+
+@functools.lru_cache(maxsize=1)
+def _compiled_script_path() -> str:
+    """将消息提取脚本编译为 .scpt（源码未变化时复用），失败时返回源码路径"""
+    compiled_path = os.path.join(SCRIPT_CACHE_DIR, 'get_messages.scpt')
+    try:
+        if os.path.getmtime(compiled_path) >= os.path.getmtime(SCRIPT_PATH):
+            return compiled_path
+    except OSError:
+        pass
+
+    try:
+        os.makedirs(SCRIPT_CACHE_DIR, exist_ok=True)
+        result = subprocess.run(
+            ['osacompile', '-o', compiled_path, SCRIPT_PATH],
+            capture_output=True,
+            text=True,
+            timeout=APPLESCRIPT_TIMEOUT_MEDIUM
+        )
+        if result.returncode == 0:
+            return compiled_path
+        logger.debug(f"编译消息提取脚本失败: {result.stderr}")
+    except (OSError, subprocess.TimeoutExpired) as e:
+        logger.debug(f"编译消息提取脚本失败: {e}")
+    return SCRIPT_PATH
+
 
 def get_messages_via_accessibility(process_name: str = "WeChat") -> list:
     """
@@ -21,21 +186,17 @@ def get_messages_via_accessibility(process_name: str = "WeChat") -> list:
     Returns:
         list: 消息文本列表 ['消息1', '消息2', ...]
     """
-    script_path = os.path.join(
-        os.path.dirname(__file__),
-        'get_messages.applescript'
-    )
-
-    if not os.path.exists(script_path):
-        logger.error(f"找不到 AppleScript 文件: {script_path}")
+    if not os.path.exists(SCRIPT_PATH):
+        logger.error(f"找不到 AppleScript 文件: {SCRIPT_PATH}")
         return []
+    script_path = _compiled_script_path()
 
     try:
         result = subprocess.run(
             ['osascript', script_path],
             capture_output=True,
             text=True,
-            timeout=config.APPLESCRIPT_TIMEOUT_MEDIUM  # 消息获取使用中等超时
+            timeout=APPLESCRIPT_TIMEOUT_MEDIUM  # 消息获取使用中等超时
         )
 
         if result.returncode != 0:
@@ -63,7 +224,7 @@ def get_messages_via_accessibility(process_name: str = "WeChat") -> list:
         return []
 
     except subprocess.TimeoutExpired:
-        logger.error(f"AppleScript 执行超时（{config.APPLESCRIPT_TIMEOUT_MEDIUM}秒），可能原因：")
+        logger.error(f"AppleScript 执行超时（{APPLESCRIPT_TIMEOUT_MEDIUM}秒），可能原因：")
         logger.error("  1. 微信无响应或卡顿")
         logger.error("  2. 系统负载过高")
         logger.error("  3. UI结构复杂，遍历时间过长")